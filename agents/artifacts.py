@@ -0,0 +1,195 @@
+import gzip
+import hashlib
+import json
+import os
+import secrets
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional
+
+# Pipeline stages in the order they run; artifacts record which stage wrote them
+STAGES = ("decompose", "collect", "clean", "synthesize", "render")
+# Stages that can be re-run from stored artifacts alone, without fetching anything
+REPLAYABLE_STAGES = ("clean", "synthesize", "render")
+
+
+def _atomic_write(path: str, data: bytes):
+    """
+    Write via a temporary file in the same directory and rename it into
+    place, so readers never see a partially written artifact
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class Run:
+    """
+    Artifacts of one research run, stored under <root>/<run_id>/.
+    manifest.json indexes every artifact with the stage that produced it,
+    so later stages can be replayed from stored inputs.
+    """
+    def __init__(self, path: str, manifest: Dict):
+        self.path = path
+        self.manifest = manifest
+        self._lock = threading.Lock()
+
+    @property
+    def run_id(self) -> str:
+        return self.manifest['run_id']
+
+    @property
+    def query(self) -> str:
+        return self.manifest['query']
+
+    def has(self, name: str) -> bool:
+        return name in self.manifest['artifacts']
+
+    def put_json(self, name: str, obj, stage: str) -> str:
+        """
+        Store a small structured artifact as plain JSON
+        """
+        return self._put(name, f"{name}.json", json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8'), stage)
+
+    def get_json(self, name: str, default=None):
+        entry = self.manifest['artifacts'].get(name)
+        if entry is None:
+            return default
+        with open(os.path.join(self.path, entry['file']), encoding='utf-8') as f:
+            return json.load(f)
+
+    def put_documents(self, name: str, documents: Iterable[Mapping], stage: str) -> str:
+        """
+        Store documents as gzip-compressed JSON lines
+        """
+        lines = "".join(json.dumps(dict(doc), ensure_ascii=False) + "\n" for doc in documents)
+        return self._put(name, f"{name}.jsonl.gz", gzip.compress(lines.encode('utf-8'), compresslevel=6), stage)
+
+    def get_documents(self, name: str) -> List[Dict]:
+        entry = self.manifest['artifacts'].get(name)
+        if entry is None:
+            return []
+        with gzip.open(os.path.join(self.path, entry['file']), 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def set_status(self, status: str):
+        with self._lock:
+            self.manifest['status'] = status
+            self._write_manifest()
+
+    def _put(self, name: str, filename: str, data: bytes, stage: str) -> str:
+        path = os.path.join(self.path, filename)
+        _atomic_write(path, data)
+        with self._lock:
+            self.manifest['artifacts'][name] = {
+                'file': filename,
+                'stage': stage,
+                'bytes': len(data),
+                'written_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._write_manifest()
+        return path
+
+    def _write_manifest(self):
+        self.manifest['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        _atomic_write(os.path.join(self.path, "manifest.json"),
+                      json.dumps(self.manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+
+
+def run_key(query: str, config: Optional[Dict] = None) -> str:
+    """
+    Deterministic checkpoint key for a query and the configuration that
+    shapes its results; case and whitespace in the query do not matter
+    """
+    payload = json.dumps({'query': " ".join(query.lower().split()), 'config': config or {}}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class ArtifactStore:
+    """
+    Run-scoped artifact storage: every run gets its own directory, so
+    concurrent runs never overwrite each other's intermediate data
+    """
+    def __init__(self, root: str = "runs"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        # Runs being written by this process, which must not be resumed twice
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def create_run(self, query: str, config: Optional[Dict] = None, run_id: Optional[str] = None) -> Run:
+        run_id = run_id or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(3)}"
+        path = os.path.join(self.root, run_id)
+        os.makedirs(path, exist_ok=True)
+        manifest = {
+            'run_id': run_id,
+            'query': query,
+            'config': config or {},
+            'key': run_key(query, config),
+            'status': 'running',
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'artifacts': {},
+        }
+        run = Run(path, manifest)
+        run._write_manifest()
+        with self._lock:
+            self._active.add(run_id)
+        return run
+
+    def resume_or_create_run(self, query: str, config: Optional[Dict] = None) -> Run:
+        """
+        Reopen the newest unfinished run with the same checkpoint key, so it
+        continues from its last completed stage, or start a new run.
+        Completed runs are never reopened: asking again researches afresh.
+        Runs still in progress in this process are skipped; the store does
+        not coordinate between processes.
+        """
+        key = run_key(query, config)
+        with self._lock:
+            for manifest in self.list_runs():
+                if (manifest.get('key') == key and manifest.get('status') != 'complete'
+                        and manifest['run_id'] not in self._active):
+                    self._active.add(manifest['run_id'])
+                    manifest['attempts'] = manifest.get('attempts', 1) + 1
+                    run = Run(os.path.join(self.root, manifest['run_id']), manifest)
+                    run.set_status('running')
+                    return run
+        return self.create_run(query, config)
+
+    def release(self, run: Run):
+        """
+        Mark a run as no longer being written by this process
+        """
+        with self._lock:
+            self._active.discard(run.run_id)
+
+    def open_run(self, run_id: str) -> Run:
+        path = os.path.join(self.root, run_id)
+        with open(os.path.join(path, "manifest.json"), encoding='utf-8') as f:
+            return Run(path, json.load(f))
+
+    def list_runs(self) -> List[Dict]:
+        """
+        Manifests of all stored runs, newest first
+        """
+        runs = []
+        for run_id in os.listdir(self.root):
+            manifest_path = os.path.join(self.root, run_id, "manifest.json")
+            try:
+                with open(manifest_path, encoding='utf-8') as f:
+                    runs.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        runs.sort(key=lambda manifest: (manifest.get('created_at', ''), manifest.get('run_id', '')), reverse=True)
+        return runs
+
+    def latest_run_id(self) -> Optional[str]:
+        runs = self.list_runs()
+        return runs[0]['run_id'] if runs else None
@@ -1,29 +1,100 @@
-import os
-from groq import Groq
-from typing import List, Dict
+import json
+from typing import List, Dict, Optional, Tuple
+from agents.llm_cache import CompletionCache, chat_completion, strip_code_fence, is_json, estimate_tokens
+from agents.llm_client import LLMClient, shared_client
+from agents.passage_ranker import PassageRanker
+from agents.source_document import excerpt, with_content
+from agents.tracing import traced
+
+MODEL = "llama3-8b-8192"
+CONTEXT_TOKENS = 8192
+SYNTHESIS_MAX_TOKENS = 4000
+MAP_MAX_TOKENS = 700
+# Headroom for the error of the character-based token estimate
+PROMPT_MARGIN_TOKENS = 200
+# Below this many characters per source a single prompt is no longer useful
+MIN_SOURCE_CHARS = 300
+# Source URLs listed per partial summary in reduce and merge prompts
+MAX_PARTIAL_URLS = 5
+# Conclusion of reports assembled without a successful synthesis call
+FALLBACK_CONCLUSION = "This report provides a comprehensive overview of the research topic based on the analyzed sources."
+
+
+def is_fallback_synthesis(synthesized_content: Dict) -> bool:
+    """
+    True for content built by a fallback path rather than by the LLM
+    """
+    return synthesized_content.get("conclusion") == FALLBACK_CONCLUSION
+
 
 class ContentAnalyzer:
-    def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if api_key and api_key != "your_actual_groq_api_key_here":
-            self.client = Groq(api_key=api_key)
-        else:
+    def __init__(self, llm_cache: Optional[CompletionCache] = None, synthesis_mode: str = "auto",
+                 llm_client: Optional[LLMClient] = None, rank_passages: bool = True,
+                 max_context_tokens: Optional[int] = None):
+        """
+        synthesis_mode is "single" (one prompt, with sources cut to fit the
+        budget; map-reduce only if not even their headers fit), "map_reduce" (summarize each
+        sub-query's sources concurrently, then merge) or "auto" (single when
+        the sources fit the context window at MIN_SOURCE_CHARS each).
+        With rank_passages, prompts carry the passages that best match the
+        query and sub-queries, packed into the token budget (optionally
+        capped at max_context_tokens), instead of each source's first characters.
+        """
+        self.llm_cache = llm_cache
+        self.synthesis_mode = synthesis_mode
+        self.ranker = PassageRanker() if rank_passages else None
+        self.max_context_tokens = max_context_tokens
+        # Rate-limited client shared with the other agents; it bounds map concurrency
+        self.client = llm_client if llm_client is not None else shared_client()
+        if not self.client.available:
             self.client = None
             print("Warning: Groq API key not found. Using fallback synthesis method.")
     
-    def synthesize_content(self, original_query: str, sub_queries: List[str], collected_data: List[Dict]) -> Dict:
+    @traced("analyzer.synthesize")
+    def synthesize_content(self, original_query: str, sub_queries: List[str], collected_data: List[Dict],
+                           source_summaries: Optional[List[str]] = None) -> Dict:
         """
-        Synthesize collected data into coherent, structured summaries
+        Synthesize collected data into coherent, structured summaries.
+        `source_summaries` may carry per-source parts already prepared with
+        `summarize_source` while collection was still running.
         """
         # Use fallback if no API key
         if not self.client:
             print("Using fallback synthesis due to missing API key")
             return self._fallback_synthesis(original_query, collected_data)
         
-        # Prepare the content for analysis
-        content_summary = self._prepare_content_summary(collected_data)
+        # Prepare the content for analysis within the prompt token budget
+        content_summary = None
+        if self.synthesis_mode != "map_reduce":
+            content_summary = self._plan_single_prompt(original_query, sub_queries, collected_data, source_summaries)
+        if content_summary is None and self.synthesis_mode == "single":
+            content_summary = self._squeeze_single_prompt(original_query, sub_queries, collected_data)
+        if content_summary is None:
+            print(f"Using map-reduce synthesis for {len(collected_data)} sources")
+            return self._map_reduce_synthesis(original_query, sub_queries, collected_data)
         
-        prompt = f"""
+        prompt = self._synthesis_prompt(original_query, sub_queries, content_summary)
+        
+        try:
+            content = chat_completion(
+                self.client, prompt,
+                model=MODEL,
+                temperature=0.3,
+                max_tokens=SYNTHESIS_MAX_TOKENS,
+                cache=self.llm_cache,
+                validate=is_json,
+            )
+            
+            # Parse as JSON, handling potential markdown code blocks
+            return json.loads(strip_code_fence(content))
+            
+        except Exception as e:
+            print(f"Error in synthesize_content: {e}")
+            # Fallback to basic synthesis
+            return self._fallback_synthesis(original_query, collected_data)
+    
+    def _synthesis_prompt(self, original_query: str, sub_queries: List[str], content_summary: str) -> str:
+        return f"""
         Based on the following research data, create a comprehensive report that answers the original query:
         "{original_query}"
         
@@ -52,46 +123,303 @@ class ContentAnalyzer:
             "conclusion": "Overall conclusion"
         }}
         """
+    
+    def _prompt_budget(self, prompt_template: str, max_tokens: int) -> int:
+        """
+        Tokens left for research data once the template and the reply are reserved
+        """
+        return CONTEXT_TOKENS - max_tokens - estimate_tokens(prompt_template) - PROMPT_MARGIN_TOKENS
+    
+    def _chars_per_source(self, collected_data: List[Dict], budget_tokens: int,
+                          minimum: int = MIN_SOURCE_CHARS) -> Optional[int]:
+        """
+        Content characters each source may use so all of them fit the budget,
+        or None if that would leave less than `minimum` per source
+        """
+        if not collected_data:
+            return MIN_SOURCE_CHARS
+        overhead = sum(len(self.summarize_source(i, with_content(data, ""))) for i, data in enumerate(collected_data))
+        # Each cut source also gets a "..." marker
+        per_source = (budget_tokens * 4 - overhead) // len(collected_data) - 3
+        return per_source if per_source >= minimum else None
+    
+    def _plan_single_prompt(self, original_query: str, sub_queries: List[str], collected_data: List[Dict],
+                            source_summaries: Optional[List[str]]) -> Optional[str]:
+        """
+        Research data for a single synthesis prompt, or None if it cannot fit
+        """
+        template = self._synthesis_prompt(original_query, sub_queries, "")
+        budget = self._prompt_budget(template, SYNTHESIS_MAX_TOKENS)
+        if source_summaries is not None and self.ranker is None:
+            joined = "\n\n".join(source_summaries)
+            if estimate_tokens(joined) <= budget:
+                return joined
+        per_source = self._chars_per_source(collected_data, budget)
+        if per_source is None:
+            return None
+        return self._fit_content_summary(original_query, sub_queries, collected_data, template,
+                                         SYNTHESIS_MAX_TOKENS, per_source)
+    
+    def _squeeze_single_prompt(self, original_query: str, sub_queries: List[str],
+                               collected_data: List[Dict]) -> Optional[str]:
+        """
+        Research data for a forced single prompt when the sources do not fit
+        at MIN_SOURCE_CHARS each: the ranked passages that fit, or each
+        source cut to whatever the budget leaves. None if not even the
+        source headers fit, so the caller falls back to map-reduce.
+        """
+        template = self._synthesis_prompt(original_query, sub_queries, "")
+        if self.ranker is not None:
+            return self._fit_content_summary(original_query, sub_queries, collected_data, template,
+                                             SYNTHESIS_MAX_TOKENS, MIN_SOURCE_CHARS)
+        per_source = self._chars_per_source(collected_data, self._prompt_budget(template, SYNTHESIS_MAX_TOKENS),
+                                            minimum=1)
+        if per_source is None:
+            print(f"{len(collected_data)} sources do not fit a single prompt")
+            return None
+        return self._prepare_content_summary(collected_data, per_source)
+    
+    def _fit_content_summary(self, original_query: str, sub_queries: List[str], collected_data: List[Dict],
+                             template: str, max_tokens: int, per_source: int) -> str:
+        """
+        Research data for a prompt built from `template`: the best-ranked
+        passages within the token budget, or each source cut to `per_source`
+        characters when passage ranking is off
+        """
+        if self.ranker is None:
+            return self._prepare_content_summary(collected_data, per_source)
+        budget = self._prompt_budget(template, max_tokens)
+        if self.max_context_tokens is not None:
+            budget = min(budget, self.max_context_tokens)
+        return self.ranker.pack(collected_data, original_query, sub_queries, budget, self.summarize_source)
+    
+    def _prepare_content_summary(self, collected_data: List[Dict], max_chars: Optional[int] = None) -> str:
+        """
+        Prepare a summary of collected data for the LLM
+        """
+        summary_parts = []
+        for i, data in enumerate(collected_data):
+            summary_parts.append(self.summarize_source(i, data, max_chars))
+        
+        return "\n\n".join(summary_parts)
+    
+    def summarize_source(self, index: int, data: Dict, max_chars: Optional[int] = None) -> str:
+        """
+        Prompt section for a single source, numbered from `index`
+        """
+        if max_chars is None:
+            content = data['content']
+        else:
+            # Decode one character past the limit to know whether it was cut
+            content = excerpt(data, max_chars + 1)
+            if len(content) > max_chars:
+                content = content[:max_chars] + "..."
+        return f"Source {index+1} (URL: {data['url']})\nTitle: {data['title']}\nContent: {content}"
+    
+    def _map_reduce_synthesis(self, original_query: str, sub_queries: List[str], collected_data: List[Dict]) -> Dict:
+        """
+        Summarize each group of sources in parallel ("map"), then merge the
+        partial summaries into the final report ("reduce")
+        """
+        groups = self._group_sources(original_query, collected_data)
+        partials = self._map_groups(original_query, groups)
+        
+        template = self._synthesis_prompt(original_query, sub_queries, "")
+        budget = self._prompt_budget(template, SYNTHESIS_MAX_TOKENS)
+        # Too many partials for one reduce prompt: merge them in batches, level by level
+        while len(partials) > 1 and self._chars_per_partial(partials, budget) is None:
+            print(f"Merging {len(partials)} partial summaries before the final reduce")
+            partials = self._merge_partials(original_query, partials)
+        content_summary = self._prepare_partial_summary(partials, budget)
+        prompt = self._synthesis_prompt(original_query, sub_queries, content_summary)
         
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="llama3-8b-8192",
+            content = chat_completion(
+                self.client, prompt,
+                model=MODEL,
                 temperature=0.3,
-                max_tokens=4000,
+                max_tokens=SYNTHESIS_MAX_TOKENS,
+                cache=self.llm_cache,
+                validate=is_json,
             )
-            
-            # Extract the content and parse as JSON
-            import json
-            content = response.choices[0].message.content.strip()
-            # Handle potential markdown code blocks
-            if content.startswith("```json"):
-                content = content[7:-3]
-            elif content.startswith("```"):
-                content = content[3:-3]
-            
-            return json.loads(content)
-            
+            return json.loads(strip_code_fence(content))
         except Exception as e:
-            print(f"Error in synthesize_content: {e}")
-            # Fallback to basic synthesis
-            return self._fallback_synthesis(original_query, collected_data)
+            print(f"Error in map-reduce synthesis: {e}")
+            # The partial summaries already make reasonable sections
+            return {
+                "title": f"Research Report: {original_query}",
+                "sections": partials,
+                "conclusion": FALLBACK_CONCLUSION
+            }
     
-    def _prepare_content_summary(self, collected_data: List[Dict]) -> str:
+    def _group_sources(self, original_query: str, collected_data: List[Dict]) -> List[Tuple[str, List[Dict]]]:
         """
-        Prepare a summary of collected data for the LLM
+        Group sources by sub-query, splitting groups that would overflow a map prompt
         """
-        summary_parts = []
-        for i, data in enumerate(collected_data):
-            part = f"Source {i+1} (URL: {data['url']})\nTitle: {data['title']}\nContent: {data['content'][:500]}..."
-            summary_parts.append(part)
+        by_sub_query: Dict[str, List[Dict]] = {}
+        for data in collected_data:
+            by_sub_query.setdefault(data.get('sub_query') or original_query, []).append(data)
         
-        return "\n\n".join(summary_parts)
+        groups = []
+        for sub_query, sources in by_sub_query.items():
+            budget = self._prompt_budget(self._map_prompt(original_query, sub_query, ""), MAP_MAX_TOKENS)
+            chunk = []
+            for data in sources:
+                if chunk and self._chars_per_source(chunk + [data], budget) is None:
+                    groups.append((sub_query, chunk))
+                    chunk = []
+                chunk.append(data)
+            if chunk:
+                groups.append((sub_query, chunk))
+        return groups
+    
+    def _map_prompt(self, original_query: str, sub_query: str, content_summary: str) -> str:
+        return f"""
+        Summarize the following research sources on the sub-query "{sub_query}".
+        The summary will be merged into a report answering: "{original_query}"
+        
+        Research data:
+        {content_summary}
+        
+        Requirements:
+        1. Write 2-3 paragraphs with the key findings, facts and figures
+        2. Only use information found in the sources
+        3. Format the response as JSON with the following structure:
+        {{
+            "heading": "Short heading for these findings",
+            "content": "Summary as a string",
+            "sources": ["url1", "url2"]
+        }}
+        """
+    
+    @traced("analyzer.map")
+    def _map_groups(self, original_query: str, groups: List[Tuple[str, List[Dict]]]) -> List[Dict]:
+        """
+        Summarize every group of sources into a partial report section,
+        sending all map prompts concurrently through the shared client
+        """
+        prompts = []
+        for sub_query, sources in groups:
+            template = self._map_prompt(original_query, sub_query, "")
+            per_source = self._chars_per_source(sources, self._prompt_budget(template, MAP_MAX_TOKENS)) or MIN_SOURCE_CHARS
+            content_summary = self._fit_content_summary(original_query, [sub_query], sources, template,
+                                                        MAP_MAX_TOKENS, per_source)
+            prompts.append(self._map_prompt(original_query, sub_query, content_summary))
+        
+        replies = self.client.complete_many(
+            prompts,
+            model=MODEL,
+            temperature=0.3,
+            max_tokens=MAP_MAX_TOKENS,
+            cache=self.llm_cache,
+            validate=is_json,
+        )
+        return [self._parse_partial(reply, sub_query, sources) for reply, (sub_query, sources) in zip(replies, groups)]
+    
+    def _parse_partial(self, reply, sub_query: str, sources: List[Dict]) -> Dict:
+        urls = [data['url'] for data in sources]
+        try:
+            if isinstance(reply, Exception):
+                raise reply
+            partial = json.loads(strip_code_fence(reply))
+            partial.setdefault("heading", sub_query)
+            partial["sources"] = partial.get("sources") or urls
+            return partial
+        except Exception as e:
+            print(f"Error summarizing sources for '{sub_query}': {e}")
+            return {"heading": sub_query, "content": excerpt(sources[0], 800), "sources": urls}
+    
+    @staticmethod
+    def _partial_part(index: int, partial: Dict, max_chars: int) -> str:
+        """
+        Reduce-prompt section for one partial summary, listing at most MAX_PARTIAL_URLS sources
+        """
+        content = str(partial.get("content", ""))
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        sources = [str(url) for url in partial.get("sources") or []][:MAX_PARTIAL_URLS]
+        return f"Summary {index+1}: {partial.get('heading', '')}\nSources: {', '.join(sources)}\nFindings: {content}"
+    
+    def _chars_per_partial(self, partials: List[Dict], budget_tokens: int,
+                           minimum: int = MIN_SOURCE_CHARS) -> Optional[int]:
+        """
+        Findings characters each partial may use so all of them, headings
+        and source lists included, fit the budget; None if below `minimum`
+        """
+        if not partials:
+            return MIN_SOURCE_CHARS
+        overhead = sum(len(self._partial_part(i, partial, 0)) + 2 for i, partial in enumerate(partials))
+        per_partial = (budget_tokens * 4 - overhead) // len(partials) - 3
+        return per_partial if per_partial >= minimum else None
+    
+    def _prepare_partial_summary(self, partials: List[Dict], budget_tokens: int) -> str:
+        """
+        Research data for the reduce prompt, trimming partials evenly to fit the budget
+        """
+        max_chars = self._chars_per_partial(partials, budget_tokens, minimum=0) or 0
+        return "\n\n".join(self._partial_part(i, partial, max_chars) for i, partial in enumerate(partials))
+    
+    def _merge_prompt(self, original_query: str, content_summary: str) -> str:
+        return f"""
+        Merge the following partial research summaries into one summary.
+        The summary will be merged into a report answering: "{original_query}"
+        
+        Partial summaries:
+        {content_summary}
+        
+        Requirements:
+        1. Write 2-3 paragraphs keeping the most important findings, facts and figures
+        2. Only use information found in the summaries
+        3. Format the response as JSON with the following structure:
+        {{
+            "heading": "Short heading for these findings",
+            "content": "Summary as a string",
+            "sources": ["url1", "url2"]
+        }}
+        """
+    
+    @traced("analyzer.merge")
+    def _merge_partials(self, original_query: str, partials: List[Dict]) -> List[Dict]:
+        """
+        One reduce level: merge consecutive batches of partials, each batch
+        as large as fits a merge prompt (at least two), concurrently
+        """
+        budget = self._prompt_budget(self._merge_prompt(original_query, ""), MAP_MAX_TOKENS)
+        batches = [[]]
+        for partial in partials:
+            batch = batches[-1]
+            if len(batch) >= 2 and self._chars_per_partial(batch + [partial], budget) is None:
+                batches.append([partial])
+            else:
+                batch.append(partial)
+        prompts = [self._merge_prompt(original_query, self._prepare_partial_summary(batch, budget))
+                   for batch in batches]
+        replies = self.client.complete_many(
+            prompts,
+            model=MODEL,
+            temperature=0.3,
+            max_tokens=MAP_MAX_TOKENS,
+            cache=self.llm_cache,
+            validate=is_json,
+        )
+        return [self._parse_merged(reply, batch) for reply, batch in zip(replies, batches)]
+    
+    def _parse_merged(self, reply, batch: List[Dict]) -> Dict:
+        urls = list(dict.fromkeys(str(url) for partial in batch for url in partial.get("sources") or []))
+        heading = str(batch[0].get("heading", ""))
+        try:
+            if isinstance(reply, Exception):
+                raise reply
+            merged = json.loads(strip_code_fence(reply))
+            merged.setdefault("heading", heading)
+            # Keep every source of the batch, the model's picks first
+            merged["sources"] = list(dict.fromkeys([str(url) for url in merged.get("sources") or []] + urls))
+            return merged
+        except Exception as e:
+            print(f"Error merging partial summaries: {e}")
+            share = max(1, 1600 // len(batch))
+            content = "\n\n".join(str(partial.get("content", ""))[:share] for partial in batch)
+            return {"heading": heading, "content": content, "sources": urls}
     
     def _fallback_synthesis(self, original_query: str, collected_data: List[Dict]) -> Dict:
         """
@@ -101,12 +429,12 @@ class ContentAnalyzer:
         for i, data in enumerate(collected_data[:3]):  # Limit to 3 sections
             sections.append({
                 "heading": f"Research Findings {i+1}",
-                "content": data['content'][:800],  # Limit content length
+                "content": excerpt(data, 800),  # Limit content length
                 "sources": [data['url']]
             })
         
         return {
             "title": f"Research Report: {original_query}",
             "sections": sections,
-            "conclusion": "This report provides a comprehensive overview of the research topic based on the analyzed sources."
+            "conclusion": FALLBACK_CONCLUSION
         }
\ No newline at end of file
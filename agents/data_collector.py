@@ -1,109 +1,431 @@
 import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict
+import codecs
+import math
+import queue
+import threading
 import time
-import random
-from urllib.parse import urljoin, urlparse
+from typing import Callable, Iterable, Iterator, List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from agents.host_health import HostHealth
+from agents.host_scheduler import HostScheduler
+from agents.http_cache import HttpCache
+from agents.text_extractor import DEFAULT_EXTRACTOR, DEFAULT_MAX_CONTENT_CHARS, get_extractor
+from agents.local_index import LocalIndex
+from agents.source_document import SourceDocument
+from agents.search import SearchProvider, GoogleSearchProvider, LocalIndexSearchProvider, ChainedSearchProvider, SEARCH_BACKENDS
+from agents.tracing import tracer, traced
+from agents.transport import Transport, RequestCancelled, parse_retry_after
+
+# Responses that say the host is refusing or failing us, not that one page is missing
+HOST_FAILURE_STATUSES = frozenset({403, 429, 500, 502, 503, 504})
 
 class DataCollector:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+    def __init__(self, max_workers: int = 8, per_host_delay: float = 1.0,
+                 cache_dir: Optional[str] = ".research_cache", cache_ttl: float = 24 * 3600,
+                 cache_max_bytes: int = 256 * 1024 * 1024, extractor: str = DEFAULT_EXTRACTOR,
+                 max_content_chars: int = DEFAULT_MAX_CONTENT_CHARS, max_response_bytes: int = 2 * 1024 * 1024,
+                 chunk_size: int = 16 * 1024, search_backend: str = "local+web",
+                 search_provider: Optional[SearchProvider] = None, request_deadline: float = 15.0,
+                 max_retries: int = 2, overfetch: float = 2.0, compress_content: bool = False,
+                 max_per_host: int = 4):
+        # Keep-alive pools sized so every worker can hold a connection to the
+        # same host; GETs are retried with jittered backoff within request_deadline
+        self.transport = Transport(pool_maxsize=max_workers, deadline=request_deadline, max_retries=max_retries)
+        self.session = self.transport.session
+        # Latency, error rate and circuit breaker state per host, kept across
+        # runs so hosts that keep failing are skipped or tried last
+        self.health = HostHealth(cache_dir) if cache_dir else None
+        # Rate limiting is per host: a global cap on in-flight requests, a
+        # minimum spacing between hits on the same host and up to
+        # max_per_host requests in flight per host, fewer for slow hosts
+        self.scheduler = HostScheduler(
+            max_concurrency=max_workers, per_host_delay=per_host_delay, max_per_host=max_per_host,
+            host_limit=(lambda host: self.health.concurrency_limit(host, max_per_host)) if self.health else None
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector")
+        # Extracted page text and search results persist across runs; pass
+        # cache_dir=None to always go to the network
+        self.cache = HttpCache(cache_dir, ttl=cache_ttl, max_bytes=cache_max_bytes) if cache_dir else None
+        # Only the first max_content_chars of each page are kept, so the
+        # extractor is allowed to stop parsing once it has that much text
+        self.extractor = extractor
+        self.max_content_chars = max_content_chars
+        # Responses are streamed and never read past max_response_bytes
+        self.max_response_bytes = max_response_bytes
+        self.chunk_size = chunk_size
+        # Every scraped source is added to a local BM25 index, which the
+        # "local" and "local+web" backends search before going to the web
+        self.local_index = LocalIndex(cache_dir) if cache_dir else None
+        self.search_provider = search_provider or self._build_search_provider(search_backend)
+        # Candidates searched per wanted source; extra fetches are cancelled
+        # as soon as enough good pages have arrived (1.0 disables hedging)
+        self.overfetch = overfetch
+        # Keep collected page text zlib-compressed in memory (large batch runs)
+        self.compress_content = compress_content
     
     def search_and_scrape(self, sub_query: str, max_sources: int = 3) -> List[Dict]:
         """
         Search and scrape 2-3 web sources for a sub-query
         """
-        sources = self._search_sources(sub_query, max_sources)
-        results = []
+        return self.collect_all([sub_query], max_sources)
+    
+    def collect_all(self, sub_queries: List[str], max_sources: int = 3) -> List[Dict]:
+        """
+        Search and scrape sources for all sub-queries concurrently.
+        Results keep the sub-query order, then the order fetches finished in,
+        as plain {'url', 'title', 'content', 'sub_query'} dicts.
+        """
+        order = {sub_query: index for index, sub_query in enumerate(sub_queries)}
+        results = [data.to_dict() for data in self.iter_collect(sub_queries, max_sources)]
+        return sorted(results, key=lambda data: order.get(data['sub_query'], len(order)))
+    
+    def _build_search_provider(self, search_backend: str) -> SearchProvider:
+        if search_backend not in SEARCH_BACKENDS:
+            raise ValueError(f"Unknown search backend '{search_backend}'. Available: {', '.join(SEARCH_BACKENDS)}")
+        web = GoogleSearchProvider(self.transport, self.scheduler, cache=self.cache)
+        if search_backend == "web" or self.local_index is None:
+            return web
+        local = LocalIndexSearchProvider(self.local_index)
+        return local if search_backend == "local" else ChainedSearchProvider([local, web])
+    
+    def iter_collect(self, sub_queries: Iterable[str], max_sources: int = 3, queue_size: int = 32,
+                     max_total_sources: Optional[int] = None,
+                     on_sub_query_done: Optional[Callable[[str], None]] = None) -> Iterator[SourceDocument]:
+        """
+        Yield scraped sources as soon as each fetch finishes, in completion
+        order, as read-only SourceDocument records (`to_dict()` for a dict).
+        Sub-queries are searched as they arrive, so `sub_queries` may be a
+        generator that is still being produced upstream. At most `queue_size`
+        finished sources wait for the consumer before fetchers block.
+        
+        Fetches are hedged: each search asks for `overfetch` times
+        `max_sources` candidates, and once `max_sources` of them pass the
+        quality filter the sub-query's remaining fetches are cancelled.
+        Once `max_total_sources` have been yielded, or the consumer stops
+        iterating, all outstanding fetches are cancelled.
+        
+        `on_sub_query_done(sub_query)` is called from the consuming thread
+        once every source of a finished sub-query has been yielded, and only
+        if its search succeeded and at least one of its sources was
+        collected: a sub-query whose search failed, found nothing (often a
+        blocked search) or whose every fetch came back empty is not
+        reported as done.
+        """
+        results = queue.Queue(maxsize=queue_size)
+        end = object()
+        sub_query_done = object()
+        lock = threading.Lock()
+        state = {'pending': 0, 'fed': False}
+        stopped = threading.Event()
+        query_cancels = []  # one event per sub-query, set when it has enough sources
+        candidates = max(max_sources, math.ceil(max_sources * self.overfetch))
+        
+        def emit(item):
+            # Never block forever on a consumer that has gone away
+            while not stopped.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+        
+        def finish_task(count: int = 1):
+            with lock:
+                state['pending'] -= count
+                finished = state['fed'] and state['pending'] == 0
+            if finished:
+                emit(end)
+        
+        def finish_query(query_state):
+            # Report a sub-query once it needs no more fetches and all its results are queued
+            with lock:
+                finished = ((query_state['done'] or query_state['outstanding'] == 0)
+                            and query_state['emitting'] == 0 and not query_state['reported'])
+                if finished:
+                    query_state['reported'] = True
+                complete = query_state['searched'] and query_state['good'] > 0
+            if finished and complete and on_sub_query_done is not None:
+                emit((sub_query_done, query_state['sub_query']))
+        
+        def on_fetched(future, query_state):
+            result = None if future.cancelled() else future.result()
+            with lock:
+                if query_state['done']:
+                    # Hedged fetch that lost the race; already accounted for
+                    return
+                query_state['outstanding'] -= 1
+                released = 1
+                if result:
+                    query_state['good'] += 1
+                    query_state['emitting'] += 1
+                    if query_state['good'] >= max_sources:
+                        # Enough good pages: stop waiting for the stragglers
+                        query_state['done'] = True
+                        query_state['cancel'].set()
+                        released += query_state['outstanding']
+                        query_state['outstanding'] = 0
+            if query_state['done']:
+                for pending in query_state['futures']:
+                    pending.cancel()
+            if result:
+                emit(result)
+                with lock:
+                    query_state['emitting'] -= 1
+            finish_query(query_state)
+            finish_task(released)
         
-        for source in sources:
+        def on_searched(future, sub_query):
+            searched = True
             try:
-                content = self._scrape_content(source['url'])
-                if content and len(content) > 300:  # Minimum content length
-                    results.append({
-                        'url': source['url'],
-                        'title': source['title'],
-                        'content': content[:1500]  # Limit content length
-                    })
-                # Rate limiting
-                time.sleep(random.uniform(0.5, 1.5))
+                sources = future.result()
             except Exception as e:
-                print(f"Error scraping {source['url']}: {e}")
-                continue
+                print(f"Error searching sources for '{sub_query}': {e}")
+                sources = []
+                searched = False
+            sources = self._rank_sources(sources)
+            query_state = {'sub_query': sub_query, 'good': 0, 'outstanding': len(sources), 'done': False,
+                           'emitting': 0, 'reported': False, 'searched': searched, 'cancel': threading.Event(),
+                           'futures': []}
+            with lock:
+                state['pending'] += len(sources)
+                query_cancels.append(query_state['cancel'])
+                if stopped.is_set():
+                    query_state['cancel'].set()
+            for source in sources:
+                fetch = self.executor.submit(self._fetch_source, source, sub_query, query_state['cancel'])
+                with lock:
+                    query_state['futures'].append(fetch)
+                fetch.add_done_callback(lambda f, query_state=query_state: on_fetched(f, query_state))
+            if not sources:
+                finish_query(query_state)
+            finish_task()
         
-        return results
+        def feed():
+            try:
+                for sub_query in sub_queries:
+                    if stopped.is_set():
+                        break
+                    with lock:
+                        state['pending'] += 1
+                    future = self.executor.submit(self._search_sources, sub_query, candidates)
+                    future.add_done_callback(lambda f, sub_query=sub_query: on_searched(f, sub_query))
+            except Exception as e:
+                print(f"Error producing sub-queries: {e}")
+            finally:
+                with lock:
+                    state['fed'] = True
+                    finished = state['pending'] == 0
+                if finished:
+                    emit(end)
+        
+        threading.Thread(target=feed, name="collector-feed", daemon=True).start()
+        yielded = 0
+        try:
+            while max_total_sources is None or yielded < max_total_sources:
+                item = results.get()
+                if item is end:
+                    return
+                if isinstance(item, tuple) and item[0] is sub_query_done:
+                    on_sub_query_done(item[1])
+                    continue
+                yielded += 1
+                yield item
+        finally:
+            stopped.set()
+            with lock:
+                for cancel in query_cancels:
+                    cancel.set()
     
-    def _search_sources(self, sub_query: str, max_sources: int) -> List[Dict]:
+    def _fetch_source(self, source: Dict, sub_query: Optional[str] = None,
+                      cancel: Optional[threading.Event] = None) -> Optional[SourceDocument]:
         """
-        Search for sources related to the sub-query
-        Using a simple approach with Google search URL (for demonstration)
+        Scrape one search result, returning None if it is unusable
         """
-        # In a production environment, you might want to use a proper search API
-        search_url = f"https://www.google.com/search?q={sub_query.replace(' ', '+')}&num={max_sources}"
-        
+        if cancel is not None and cancel.is_set():
+            return None
         try:
-            response = self.session.get(search_url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract search results (this is a simplified approach)
-            results = []
-            links = soup.find_all('a', href=True)
-            
-            for link in links:
-                href = link['href']
-                if href.startswith('/url?q='):
-                    # Extract actual URL from Google's redirect
-                    url = href.split('/url?q=')[1].split('&')[0]
-                    if self._is_valid_url(url):
-                        results.append({
-                            'url': url,
-                            'title': link.get_text() or "No title"
-                        })
-                        
-                        if len(results) >= max_sources:
-                            break
-            
-            return results[:max_sources]
+            if source.get('content'):
+                # Already have the text (e.g. from the local index)
+                content = source['content']
+            else:
+                with tracer.span("collector.fetch", url=source['url']) as span:
+                    content = self._scrape_content(source['url'], cancel)
+                    span.set('chars', len(content))
+                if content and self.local_index is not None:
+                    self.local_index.add_document(source['url'], source['title'], content[:self.max_content_chars])
+            if content and len(content) > 300:  # Minimum content length
+                return SourceDocument(source['url'], source['title'],
+                                      content[:self.max_content_chars],  # Limit content length
+                                      sub_query, compress=self.compress_content)
         except Exception as e:
-            print(f"Error searching sources: {e}")
-            return []
+            print(f"Error scraping {source['url']}: {e}")
+        return None
+    
+    def close(self):
+        """
+        Release worker threads and pooled connections
+        """
+        self.executor.shutdown(wait=False)
+        self.transport.close()
+        if self.cache:
+            self.cache.close()
+        if self.local_index is not None:
+            self.local_index.close()
+        if self.health is not None:
+            self.health.close()
     
-    def _scrape_content(self, url: str) -> str:
+    def _rank_sources(self, sources: List[Dict]) -> List[Dict]:
+        """
+        Search results to fetch, healthiest hosts first; results on hosts
+        whose circuit breaker is open are dropped. Results that already
+        carry their text (local index) need no fetch and go first.
+        """
+        if self.health is None:
+            return sources
+        stored = [source for source in sources if source.get('content')]
+        to_fetch = [source for source in sources if not source.get('content')]
+        order = self.health.rank([source['url'] for source in to_fetch], self.scheduler.host_of)
+        if len(order) < len(to_fetch):
+            tracer.count('collector.circuit_skipped', len(to_fetch) - len(order))
+        return stored + [to_fetch[index] for index in order]
+    
+    def _record_response(self, host: str, response: requests.Response, latency: float):
+        if self.health is None:
+            return
+        if response.status_code in HOST_FAILURE_STATUSES:
+            self._record_health(self.health.record_failure, host, latency,
+                                parse_retry_after(response.headers.get('Retry-After')))
+        else:
+            self._record_health(self.health.record_success, host, latency)
+    
+    @staticmethod
+    def _record_health(record: Callable, host: str, *args):
+        """
+        Update host health without letting its bookkeeping (a SQLite write
+        that may hit "database is locked") cost the page being fetched
+        """
+        try:
+            record(host, *args)
+        except Exception as e:
+            print(f"Warning: could not record health of {host}: {e}")
+            tracer.count('collector.health_errors')
+    
+    @traced("collector.search")
+    def _search_sources(self, sub_query: str, max_sources: int) -> List[Dict]:
+        """
+        Search for sources related to the sub-query using the configured
+        backend (search errors propagate to the caller)
+        """
+        return self.search_provider.search(sub_query, max_sources)[:max_sources]
+    
+    def _scrape_content(self, url: str, cancel: Optional[threading.Event] = None) -> str:
         """
         Scrape clean text content from a URL
         """
+        cached = self.cache.get(url) if self.cache else None
+        if cached and self.cache.is_fresh(cached):
+            self.cache.record_hit()
+            tracer.count('collector.cache_hits')
+            return cached['body']
+        
+        host = self.scheduler.host_of(url)
+        if self.health is not None and not self.health.allow(host):
+            # Known bad host (open circuit breaker or Retry-After): don't wait on it
+            tracer.count('collector.circuit_skipped')
+            return ""
+        started = None
+        recorded = False
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Get text content
-            text = soup.get_text(separator=' ', strip=True)
-            
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            headers = self.cache.conditional_headers(cached) if self.cache else {}
+            with self.scheduler.slot(url, cancel):
+                # The deadline covers retries and the body read, but not the politeness wait
+                deadline_at = self.transport.deadline_at()
+                started = time.monotonic()
+                with self.transport.get(url, headers=headers, stream=True, cancel=cancel,
+                                        deadline_at=deadline_at) as response:
+                    self._record_response(host, response, time.monotonic() - started)
+                    recorded = True
+                    if cached and response.status_code == 304:
+                        # Unchanged upstream: reuse the stored text without re-parsing
+                        self.cache.refresh(url)
+                        self.cache.record_hit(revalidated=True)
+                        tracer.count('collector.cache_revalidated')
+                        return cached['body']
+                    response.raise_for_status()
+                    if self.cache:
+                        self.cache.record_miss()
+                        tracer.count('collector.cache_misses')
+                    
+                    content_type = response.headers.get('Content-Type', '')
+                    if self._is_html(content_type):
+                        text = self._read_text(response, cancel, deadline_at)
+                    else:
+                        # PDFs, images etc.: reject before downloading the body.
+                        # The empty entry is still cached so we don't retry it.
+                        print(f"Skipping {url}: unsupported content type '{content_type}'")
+                        tracer.count('collector.rejected_content_type')
+                        text = ""
             
+            if self.cache:
+                self.cache.put(url, text, etag=response.headers.get('ETag'),
+                               last_modified=response.headers.get('Last-Modified'))
             return text
         except Exception as e:
+            if self.health is not None and not recorded:
+                if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                    self._record_health(self.health.record_failure, host,
+                                        time.monotonic() - started if started else None)
+                else:
+                    self.health.abandon(host)
+            if isinstance(e, RequestCancelled) or (cancel is not None and cancel.is_set()):
+                # Nobody is waiting for this page any more
+                tracer.count('collector.cancelled')
+                return ""
             print(f"Error scraping content from {url}: {e}")
+            tracer.count('collector.fetch_errors')
             return ""
     
-    def _is_valid_url(self, url: str) -> bool:
+    def _read_text(self, response: requests.Response, cancel: Optional[threading.Event] = None,
+                   deadline_at: Optional[float] = None) -> str:
         """
-        Check if URL is valid and scrapable
+        Stream the response body into the text extractor, stopping at the
+        byte budget, at the deadline (keeping what was read so far) or as
+        soon as the extractor has enough text
         """
+        extractor = get_extractor(self.extractor, self.max_content_chars)
+        decoder = codecs.getincrementaldecoder(self._response_encoding(response))(errors='replace')
+        remaining = self.max_response_bytes
+        
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            tracer.count('collector.bytes_fetched', len(chunk))
+            if extractor.feed(decoder.decode(chunk)) or remaining <= 0:
+                break
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled(response.url)
+            if deadline_at is not None and time.monotonic() >= deadline_at:
+                tracer.count('collector.deadline_truncated')
+                break
+        else:
+            extractor.feed(decoder.decode(b'', final=True))
+        
+        return extractor.close()
+    
+    def _response_encoding(self, response: requests.Response) -> str:
+        """
+        Charset from the Content-Type header, defaulting to UTF-8 rather
+        than requests' ISO-8859-1 fallback for text/* without a charset
+        """
+        encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '').lower() else None
         try:
-            parsed = urlparse(url)
-            return bool(parsed.netloc) and bool(parsed.scheme) and 'google' not in parsed.netloc
-        except:
-            return False
\ No newline at end of file
+            return codecs.lookup(encoding).name if encoding else 'utf-8'
+        except LookupError:
+            return 'utf-8'
+    
+    def _is_html(self, content_type: str) -> bool:
+        """
+        Check if a Content-Type header can be parsed as a web page
+        """
+        mime = content_type.split(';')[0].strip().lower()
+        return not mime or mime in ('text/html', 'application/xhtml+xml', 'text/plain')
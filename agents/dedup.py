@@ -0,0 +1,90 @@
+import hashlib
+import random
+import re
+import zlib
+from typing import Dict, List, Optional
+from agents.http_cache import normalize_url
+
+WORD = re.compile(r"\w+")
+
+
+class SourceDeduplicator:
+    """
+    Incremental duplicate filter for scraped sources.
+    Sources are dropped when their normalized URL or exact text was already
+    seen, or when the MinHash estimate of their word-shingle Jaccard
+    similarity to a kept source reaches `threshold`. Candidates come from
+    LSH buckets (`bands` x `rows` signature slices), so each check only
+    compares against likely matches instead of every kept source.
+    """
+    def __init__(self, threshold: float = 0.8, shingle_size: int = 5, bands: int = 16, rows: int = 4, seed: int = 1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = rows
+        generator = random.Random(seed)
+        # XOR with a random mask permutes the 32-bit shingle hash space;
+        # it is much cheaper in pure Python than (a * x + b) mod p
+        self._masks = [generator.getrandbits(32) for _ in range(bands * rows)]
+        self._urls: Dict[str, str] = {}
+        self._content_hashes: Dict[str, str] = {}
+        self._signatures: Dict[str, List[int]] = {}
+        self._buckets: Dict[tuple, List[str]] = {}
+        self.collapsed: List[Dict] = []
+
+    def signature(self, text: str) -> List[int]:
+        words = WORD.findall(text.lower())
+        size = self.shingle_size
+        shingles = {zlib.crc32(" ".join(words[i:i + size]).encode('utf-8')) for i in range(max(len(words) - size + 1, 1))}
+        return [min(shingle ^ mask for shingle in shingles) for mask in self._masks]
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(self.bands):
+            yield (band,) + tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def check(self, data: Dict) -> Optional[Dict]:
+        """
+        Register a source. Returns None if it is kept, otherwise a record
+        of which kept source it collapsed into and why.
+        """
+        url = data['url']
+        url_key = normalize_url(url)
+        if url_key in self._urls:
+            return self._collapse(url, self._urls[url_key], "duplicate URL", 1.0)
+
+        text = " ".join(data.get('content', '').split())
+        content_hash = hashlib.sha1(text.lower().encode('utf-8')).hexdigest()
+        if content_hash in self._content_hashes:
+            return self._collapse(url, self._content_hashes[content_hash], "identical content", 1.0)
+
+        signature = self.signature(text)
+        candidates = {kept for key in self._band_keys(signature) for kept in self._buckets.get(key, ())}
+        best_url, best_similarity = None, 0.0
+        for kept in candidates:
+            kept_signature = self._signatures[kept]
+            similarity = sum(1 for x, y in zip(signature, kept_signature) if x == y) / len(signature)
+            if similarity > best_similarity:
+                best_url, best_similarity = kept, similarity
+        if best_url and best_similarity >= self.threshold:
+            return self._collapse(url, best_url, "near-duplicate content", best_similarity)
+
+        self._urls[url_key] = url
+        self._content_hashes[content_hash] = url
+        self._signatures[url] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(url)
+        return None
+
+    def _collapse(self, url: str, duplicate_of: str, reason: str, similarity: float) -> Dict:
+        record = {'url': url, 'duplicate_of': duplicate_of, 'reason': reason, 'similarity': round(similarity, 3)}
+        self.collapsed.append(record)
+        return record
+
+
+def deduplicate_sources(collected_data: List[Dict], threshold: float = 0.8):
+    """
+    Filter a list of sources, returning (kept_sources, collapsed_records)
+    """
+    deduplicator = SourceDeduplicator(threshold=threshold)
+    kept = [data for data in collected_data if deduplicator.check(data) is None]
+    return kept, deduplicator.collapsed
@@ -0,0 +1,234 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class HostStats:
+    """
+    Health of one host: latency and error-rate EWMAs, the circuit breaker
+    state and when the host may be tried again
+    """
+    __slots__ = ("host", "latency", "error_rate", "requests", "failures", "consecutive_failures",
+                 "state", "retry_at", "cooldown", "probing", "updated_at")
+
+    def __init__(self, host: str, latency: Optional[float] = None, error_rate: float = 0.0, requests: int = 0,
+                 failures: int = 0, consecutive_failures: int = 0, state: str = CLOSED, retry_at: float = 0.0,
+                 cooldown: float = 0.0, updated_at: float = 0.0):
+        self.host = host
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = requests
+        self.failures = failures
+        self.consecutive_failures = consecutive_failures
+        self.state = state
+        self.retry_at = retry_at
+        self.cooldown = cooldown
+        # A half-open breaker lets a single probe request through at a time
+        self.probing = False
+        self.updated_at = updated_at
+
+
+class HostHealth:
+    """
+    Per-host health shared by all fetches and persisted across runs in
+    SQLite, so hosts that kept timing out or refusing requests are known
+    to be bad before the next run tries them.
+
+    Every fetch outcome updates the host's latency and error-rate EWMAs.
+    After `failure_threshold` consecutive failures, or once the error rate
+    passes `max_error_rate` over at least `min_requests`, the host's
+    circuit breaker opens and its URLs are skipped for `cooldown` seconds,
+    doubling on each failed probe up to `max_cooldown`. A Retry-After
+    header keeps the host closed for at least that long. After the
+    cooldown one probe request is let through (half-open); its success
+    closes the breaker again.
+    """
+    def __init__(self, cache_dir: str = ".research_cache", alpha: float = 0.3, failure_threshold: int = 3,
+                 max_error_rate: float = 0.5, min_requests: int = 4, cooldown: float = 300.0,
+                 max_cooldown: float = 6 * 3600, stale_after: float = 7 * 24 * 3600):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.max_error_rate = max_error_rate
+        self.min_requests = min_requests
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.skipped = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "host_health.sqlite3"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                latency REAL,
+                error_rate REAL NOT NULL,
+                requests INTEGER NOT NULL,
+                failures INTEGER NOT NULL,
+                consecutive_failures INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                retry_at REAL NOT NULL,
+                cooldown REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        # Hosts not seen for a week start over
+        self._db.execute("DELETE FROM hosts WHERE updated_at < ?", (time.time() - stale_after,))
+        self._db.commit()
+        self._hosts: Dict[str, HostStats] = {
+            row[0]: HostStats(*row) for row in self._db.execute(
+                "SELECT host, latency, error_rate, requests, failures, consecutive_failures, state, retry_at, "
+                "cooldown, updated_at FROM hosts"
+            )
+        }
+
+    def get(self, host: str) -> Optional[HostStats]:
+        with self._lock:
+            return self._hosts.get(host)
+
+    def allow(self, host: str) -> bool:
+        """
+        Whether a request to the host may start now. Once an open breaker's
+        cooldown is over, the first caller becomes the half-open probe.
+        """
+        with self._lock:
+            stats = self._hosts.get(host)
+            if stats is None:
+                return True
+            if time.time() < stats.retry_at:
+                self.skipped += 1
+                return False
+            if stats.state == CLOSED:
+                return True
+            if stats.probing:
+                self.skipped += 1
+                return False
+            stats.state = HALF_OPEN
+            stats.probing = True
+            return True
+
+    def record_success(self, host: str, latency: float):
+        with self._lock:
+            stats = self._stats(host)
+            stats.requests += 1
+            stats.latency = latency if stats.latency is None else (
+                self.alpha * latency + (1 - self.alpha) * stats.latency)
+            stats.error_rate *= 1 - self.alpha
+            stats.consecutive_failures = 0
+            if stats.state != CLOSED:
+                print(f"Host {host} recovered, closing its circuit breaker")
+            stats.state = CLOSED
+            stats.cooldown = 0.0
+            stats.probing = False
+            self._save(stats)
+
+    def record_failure(self, host: str, latency: Optional[float] = None, retry_after: Optional[float] = None):
+        """
+        Count a timeout, connection error, 403, 429 or 5xx. `retry_after`
+        (from the response header) keeps the host closed at least that long.
+        """
+        now = time.time()
+        with self._lock:
+            stats = self._stats(host)
+            stats.requests += 1
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.error_rate = self.alpha + (1 - self.alpha) * stats.error_rate
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else (
+                    self.alpha * latency + (1 - self.alpha) * stats.latency)
+            tripped = (stats.consecutive_failures >= self.failure_threshold
+                       or (stats.requests >= self.min_requests and stats.error_rate > self.max_error_rate))
+            if stats.state == HALF_OPEN or (stats.state == CLOSED and tripped):
+                # A failed probe doubles the cooldown
+                stats.cooldown = (min(self.max_cooldown, max(self.base_cooldown, stats.cooldown * 2))
+                                  if stats.state == HALF_OPEN else self.base_cooldown)
+                stats.state = OPEN
+                stats.retry_at = max(stats.retry_at, now + stats.cooldown)
+                print(f"Host {host} keeps failing, skipping it for {stats.cooldown:.0f}s")
+            if retry_after:
+                stats.retry_at = max(stats.retry_at, now + min(retry_after, self.max_cooldown))
+            stats.probing = False
+            self._save(stats)
+
+    def concurrency_limit(self, host: str, max_per_host: int, fast_latency: float = 1.0) -> int:
+        """
+        Requests the host should have in flight at once: `max_per_host`
+        for unknown hosts and hosts answering within `fast_latency`, fewer
+        as responses slow down, and one while it is failing or on probation
+        """
+        with self._lock:
+            stats = self._hosts.get(host)
+            if stats is None or stats.latency is None:
+                return max_per_host
+            if stats.state != CLOSED or stats.error_rate > self.max_error_rate / 2:
+                return 1
+            return max(1, min(max_per_host, int(max_per_host * fast_latency / max(stats.latency, 1e-3))))
+
+    def abandon(self, host: str):
+        """
+        A request ended without an outcome (cancelled): let another probe through
+        """
+        with self._lock:
+            stats = self._hosts.get(host)
+            if stats is not None:
+                stats.probing = False
+
+    def rank(self, urls: List[str], host_of) -> List[int]:
+        """
+        Indexes of `urls` worth fetching, healthiest hosts first (stable for
+        ties); URLs on hosts that are closed for now are left out
+        """
+        now = time.time()
+        with self._lock:
+            usable = []
+            for index, url in enumerate(urls):
+                stats = self._hosts.get(host_of(url))
+                if stats is not None and now < stats.retry_at:
+                    self.skipped += 1
+                    continue
+                usable.append((self._cost(stats), index))
+        return [index for _, index in sorted(usable)]
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            return {
+                'hosts': len(self._hosts),
+                'open': sum(1 for stats in self._hosts.values() if now < stats.retry_at),
+                'skipped': self.skipped,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _cost(stats: Optional[HostStats]) -> float:
+        # Expected seconds lost per request: latency, plus a 10s timeout weighted by the error rate
+        if stats is None:
+            return 0.0
+        return (stats.latency or 0.0) + stats.error_rate * 10.0
+
+    def _stats(self, host: str) -> HostStats:
+        # Caller holds the lock
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = HostStats(host)
+        return stats
+
+    def _save(self, stats: HostStats):
+        # Caller holds the lock
+        stats.updated_at = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO hosts (host, latency, error_rate, requests, failures, consecutive_failures, "
+            "state, retry_at, cooldown, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (stats.host, stats.latency, stats.error_rate, stats.requests, stats.failures,
+             stats.consecutive_failures, stats.state, stats.retry_at, stats.cooldown, stats.updated_at)
+        )
+        self._db.commit()
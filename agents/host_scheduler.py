@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+from urllib.parse import urlparse
+from agents.tracing import tracer
+
+
+class HostScheduler:
+    """
+    Politeness scheduler for concurrent fetches: a global cap on in-flight
+    requests, a minimum spacing between requests to the same host and a
+    per-host cap on requests in flight. The per-host cap is re-read from
+    `host_limit(host)` whenever a request waits for it, so it can follow
+    the host's observed response times.
+    
+    Requests to a host take their spacing slot in arrival order, when they
+    reach the front of the host's queue, rather than booking a start time
+    up front. A request whose `cancel` event is set while it waits leaves
+    the queue, so cancelled (hedged) fetches neither hold a worker thread
+    nor push back later requests to the host.
+    """
+    def __init__(self, max_concurrency: int = 8, per_host_delay: float = 1.0, max_per_host: Optional[int] = None,
+                 host_limit: Optional[Callable[[str], int]] = None):
+        self.max_concurrency = max_concurrency
+        self.per_host_delay = per_host_delay
+        self.max_per_host = max_per_host or max_concurrency
+        self.host_limit = host_limit
+        self._global = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._host_free = threading.Condition(self._lock)
+        self._next_start = {}  # host -> earliest monotonic time for the next request
+        self._waiting = {}  # host -> requests queued for their spacing slot, in arrival order
+        self._in_flight = {}  # host -> requests holding a slot
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def _wait_turn(self, host: str, cancel: Optional[threading.Event] = None) -> bool:
+        """
+        Wait until this request is first in the host's queue and the
+        spacing window has passed, then take the slot; False (and no slot
+        taken) if `cancel` was set while waiting
+        """
+        ticket = object()
+        with self._host_free:
+            waiting = self._waiting.setdefault(host, deque())
+            waiting.append(ticket)
+            try:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        return False
+                    now = time.monotonic()
+                    timeout = None
+                    if waiting[0] is ticket:
+                        start = self._next_start.get(host, 0.0)
+                        if now >= start:
+                            self._next_start[host] = now + self.per_host_delay
+                            return True
+                        timeout = start - now
+                    if cancel is not None:
+                        # Look at the cancel event now and then
+                        timeout = 0.1 if timeout is None else min(timeout, 0.1)
+                    self._host_free.wait(timeout)
+            finally:
+                waiting.remove(ticket)
+                if not waiting:
+                    del self._waiting[host]
+                self._host_free.notify_all()
+
+    def _limit(self, host: str) -> int:
+        if self.host_limit is None:
+            return self.max_per_host
+        return max(1, min(self.max_per_host, self.host_limit(host)))
+
+    def _acquire_host(self, host: str, cancel: Optional[threading.Event] = None) -> bool:
+        """
+        Take a per-host slot; False if `cancel` was set while waiting for one
+        """
+        limit = self._limit(host)
+        with self._host_free:
+            waited = time.monotonic()
+            while self._in_flight.get(host, 0) >= limit:
+                if cancel is not None and cancel.is_set():
+                    return False
+                # Re-check the limit now and then: it may grow as the host speeds up
+                self._host_free.wait(0.5)
+                limit = self._limit(host)
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            waited = time.monotonic() - waited
+        if waited > 0.001:
+            tracer.count('collector.host_limit_wait_s', waited)
+        return True
+
+    def _release_host(self, host: str):
+        with self._host_free:
+            self._in_flight[host] -= 1
+            if not self._in_flight[host]:
+                del self._in_flight[host]
+            self._host_free.notify_all()
+
+    @contextmanager
+    def slot(self, url: str, cancel: Optional[threading.Event] = None):
+        """
+        Wait for the host's spacing window and a free per-host slot, then
+        hold one global concurrency slot. Raises RequestCancelled once
+        `cancel` is set while waiting.
+        """
+        host = self.host_of(url)
+        # Wait for the host before taking a global slot so waiting on a
+        # busy host never blocks requests to other hosts
+        waited = time.monotonic()
+        turn = self._wait_turn(host, cancel)
+        waited = time.monotonic() - waited
+        if waited > 0.001:
+            tracer.count('collector.politeness_wait_s', waited)
+        if not turn or not self._acquire_host(host, cancel):
+            from agents.transport import RequestCancelled
+            raise RequestCancelled(f"cancelled before fetching {url}")
+        try:
+            with self._global:
+                yield
+        finally:
+            self._release_host(host)
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Query parameters that never change the page content: any utm_* parameter
+# and these exact names
+TRACKING_PREFIXES = ('utm_',)
+TRACKING_PARAMS = frozenset(('gclid', 'fbclid', 'sa', 'ved', 'usg'))
+
+
+def is_tracking_param(key: str) -> bool:
+    key = key.lower()
+    return key.startswith(TRACKING_PREFIXES) or key in TRACKING_PARAMS
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL used as the cache key
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not is_tracking_param(key)
+    )
+    path = parsed.path or '/'
+    return urlunparse((scheme, netloc, path, '', urlencode(query), ''))
+
+
+class HttpCache:
+    """
+    Persistent SQLite cache of extracted page text and search results.
+    Entries expire after `ttl` seconds but keep their ETag/Last-Modified
+    validators for conditional revalidation; least-recently-used entries
+    are evicted once the stored size exceeds `max_bytes`.
+    """
+    def __init__(self, cache_dir: str = ".research_cache", ttl: float = 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "http_cache.sqlite3"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                url TEXT NOT NULL,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.commit()
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @staticmethod
+    def _key(url: str, kind: str) -> str:
+        return hashlib.sha256(f"{kind}:{normalize_url(url)}".encode('utf-8')).hexdigest()
+
+    def get(self, url: str, kind: str = "page") -> Optional[Dict]:
+        """
+        Look up an entry, fresh or stale. Callers check `is_fresh` and may
+        revalidate a stale entry using its `etag` / `last_modified`.
+        """
+        key = self._key(url, kind)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return {'body': row[0], 'etag': row[1], 'last_modified': row[2], 'fetched_at': row[3]}
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry['fetched_at'] < self.ttl
+
+    def record_hit(self, revalidated: bool = False):
+        with self._lock:
+            self.hits += 1
+            if revalidated:
+                self.revalidated += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict:
+        """
+        Request headers that let the server answer 304 for a stale entry
+        """
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def refresh(self, url: str, kind: str = "page"):
+        """
+        Mark an entry as fetched now after a successful 304 revalidation
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, self._key(url, kind))
+            )
+            self._db.commit()
+
+    def put(self, url: str, body: str, kind: str = "page", etag: Optional[str] = None, last_modified: Optional[str] = None):
+        key = self._key(url, kind)
+        size = len(body.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, normalize_url(url), body, etag, last_modified, now, now, size)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """
+        Drop least-recently-used entries until the cache is back under budget
+        """
+        while self._total_bytes > self.max_bytes:
+            rows = self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at LIMIT 64").fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': self._total_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, Optional
+from agents.tracing import tracer
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for Llama-family tokenizers (~4 characters per token)
+    """
+    return len(text) // 4 + 1
+
+
+class CompletionCache:
+    """
+    Persistent cache of chat completions shared by the LLM-backed agents.
+    Entries are keyed by a hash of (model, temperature, max_tokens, prompt),
+    evicted least-recently-used beyond `max_entries` and expired after `ttl`
+    seconds. Identical requests that are in flight at the same time are
+    coalesced into a single API call.
+    """
+    def __init__(self, cache_dir: str = ".research_cache", max_entries: int = 2000, ttl: float = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._db = sqlite3.connect(os.path.join(cache_dir, "llm_cache.sqlite3"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+        payload = json.dumps([model, temperature, max_tokens, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT content, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[1] >= self.ttl:
+                return None
+            self._db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, content: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)", (key, content, now, now))
+            # Evict least-recently-used entries beyond the size limit
+            self._db.execute("""
+                DELETE FROM completions WHERE key IN (
+                    SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._db.commit()
+
+    def complete(self, call: Callable[[], str], model: str, temperature: float, max_tokens: int, prompt: str,
+                 validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Return the cached completion for this request, or run `call` once
+        and share its result with any identical concurrent requests.
+        Results rejected by `validate` are returned but not stored.
+        """
+        key = self.make_key(model, temperature, max_tokens, prompt)
+        content = self.get(key)
+        if content is not None:
+            with self._lock:
+                self.hits += 1
+            tracer.count('llm.cache_hits')
+            return content
+
+        with self._lock:
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = self._in_flight[key] = Future()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.coalesced += 1
+        if not owner:
+            tracer.count('llm.coalesced')
+            return pending.result()
+
+        try:
+            content = call()
+            if validate is None or validate(content):
+                self.put(key, content)
+            pending.set_result(content)
+            return content
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced, 'entries': entries}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def chat_completion(client, prompt: str, model: str, temperature: float, max_tokens: int,
+                    cache: Optional[CompletionCache] = None,
+                    validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Run a single-message chat completion and return the stripped text.
+    `client` is anything exposing `chat.completions.create` (Groq or a fake).
+    """
+    with tracer.span("llm.completion", model=model, max_tokens=max_tokens) as span:
+        def call() -> str:
+            response = client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+            content = response.choices[0].message.content.strip()
+            _record_usage(span, getattr(response, 'usage', None), prompt, content)
+            return content
+
+        if cache is None:
+            return call()
+        span.set('cached', True)  # overwritten by _record_usage when the API is called
+        return cache.complete(call, model, temperature, max_tokens, prompt, validate=validate)
+
+
+def _record_usage(span, usage, prompt: str, content: str):
+    """
+    Count tokens sent and received, estimating when the response has no usage block
+    """
+    sent = getattr(usage, 'prompt_tokens', None) or estimate_tokens(prompt)
+    received = getattr(usage, 'completion_tokens', None) or estimate_tokens(content)
+    span.set('cached', False)
+    span.set('tokens_sent', sent)
+    span.set('tokens_received', received)
+    tracer.count('llm.calls')
+    tracer.count('llm.tokens_sent', sent)
+    tracer.count('llm.tokens_received', received)
+
+
+def chat_completion_stream(client, prompt: str, model: str, temperature: float, max_tokens: int,
+                           cache: Optional[CompletionCache] = None,
+                           validate: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+    """
+    Streaming variant of `chat_completion` that yields text deltas as they
+    arrive. A cached completion is yielded in one piece; a fresh one is
+    stored once the stream completes. Streams are not coalesced.
+    """
+    key = CompletionCache.make_key(model, temperature, max_tokens, prompt) if cache else None
+    if cache:
+        content = cache.get(key)
+        if content is not None:
+            with cache._lock:
+                cache.hits += 1
+            tracer.count('llm.cache_hits')
+            yield content
+            return
+        with cache._lock:
+            cache.misses += 1
+
+    with tracer.span("llm.completion_stream", model=model, max_tokens=max_tokens) as span:
+        stream = client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        parts = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        content = "".join(parts).strip()
+        _record_usage(span, None, prompt, content)
+    if cache and (validate is None or validate(content)):
+        cache.put(key, content)
+
+
+def strip_code_fence(content: str) -> str:
+    """
+    Remove a surrounding ```json ... ``` markdown block if present
+    """
+    if content.startswith("```json"):
+        content = content[7:-3]
+    elif content.startswith("```"):
+        content = content[3:-3]
+    return content
+
+
+def is_json(content: str) -> bool:
+    try:
+        json.loads(strip_code_fence(content))
+        return True
+    except ValueError:
+        return False
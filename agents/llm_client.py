@@ -0,0 +1,414 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Sequence, Union
+from agents.llm_cache import CompletionCache, estimate_tokens
+from agents.tracing import tracer
+
+# Groq free-tier limits for llama3-8b-8192
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 30000
+# Retried with backoff; 429 also pauses every request sharing the limits
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute` units per minute up to a full
+    minute's worth, so short bursts are allowed but the average is bounded
+    """
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` can be taken (requests larger than the
+        bucket only wait for a full bucket)
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets shared by every
+    prompt of an LLMClient. Waiters are served in arrival order. Runs on
+    the client's event loop only.
+    """
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self._lock = None
+
+    async def acquire(self, tokens: int) -> float:
+        """
+        Wait until a request of `tokens` fits both budgets; returns seconds waited
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens),
+                            self.paused_until - time.monotonic())
+                if delay <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return time.monotonic() - started
+                await asyncio.sleep(delay)
+
+    def refund(self, tokens: int):
+        """
+        Return tokens reserved for a completion that came back shorter
+        """
+        if tokens > 0:
+            self.tokens.refund(tokens)
+
+    def pause(self, seconds: float):
+        """
+        Hold every request back for `seconds`, e.g. after a 429
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class _Completions:
+    def __init__(self, client: "LLMClient"):
+        self._client = client
+
+    def create(self, **kwargs):
+        return self._client.create(**kwargs)
+
+
+class LLMClient:
+    """
+    Asynchronous, rate-limited chat completion client shared by every
+    LLM-backed agent (and by every query in batch mode).
+
+    Requests run on a private event loop thread against an async backend
+    (AsyncGroq by default, or StubBackend for tests and benchmarks), so
+    any number of prompts can be in flight without a thread each. A shared
+    RateLimiter keeps them under the requests- and tokens-per-minute
+    limits, and 429/5xx responses are retried with jittered exponential
+    backoff honoring Retry-After. `chat.completions.create` mirrors the
+    Groq client, so the object can be passed wherever a Groq client was.
+    """
+    def __init__(self, backend=None, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE, max_concurrency: int = 8,
+                 max_retries: int = 4, backoff_base: float = 1.0, backoff_max: float = 30.0):
+        # The Groq client is created on first request: importing groq (and
+        # httpx) is a large share of startup and fallback runs never need it
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self._loop = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+
+    @staticmethod
+    def _default_backend():
+        api_key = _api_key()
+        if api_key is None:
+            return None
+        from groq import AsyncGroq
+        # Retries are handled here so they share the rate limiter
+        return AsyncGroq(api_key=api_key, max_retries=0)
+
+    @property
+    def backend(self):
+        if self._backend is None and _api_key() is not None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = self._default_backend()
+        return self._backend
+
+    @property
+    def available(self) -> bool:
+        return self._backend is not None or _api_key() is not None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def submit(self, **kwargs) -> Future:
+        """
+        Schedule a chat completion request; the Future resolves to the response
+        """
+        return asyncio.run_coroutine_threadsafe(self.acreate(**kwargs), self._get_loop())
+
+    def create(self, **kwargs):
+        """
+        Blocking chat completion. With stream=True, returns an iterator of chunks.
+        """
+        if kwargs.get('stream'):
+            return self._iterate(self.submit(**kwargs).result())
+        return self.submit(**kwargs).result()
+
+    def _iterate(self, stream):
+        loop = self._get_loop()
+
+        async def next_chunk():
+            return await stream.__anext__()
+
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(next_chunk(), loop).result()
+            except StopAsyncIteration:
+                return
+
+    async def acreate(self, messages: List[Dict], model: str, temperature: float = 0.0,
+                      max_tokens: int = 1024, stream: bool = False, **kwargs):
+        """
+        Chat completion under the shared rate limits, retrying 429s and 5xx
+        """
+        if self.backend is None:
+            raise RuntimeError("no LLM backend configured (set GROQ_API_KEY)")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        prompt_tokens = sum(estimate_tokens(message.get('content', '')) for message in messages)
+        reserved = prompt_tokens + max_tokens
+
+        attempt = 0
+        while True:
+            waited = await self.limiter.acquire(reserved)
+            if waited > 0:
+                tracer.count('llm.rate_limit_wait_s', waited)
+            try:
+                async with self._semaphore:
+                    response = await self.backend.chat.completions.create(
+                        messages=messages, model=model, temperature=temperature,
+                        max_tokens=max_tokens, stream=stream, **kwargs
+                    )
+            except Exception as e:
+                status = getattr(e, 'status_code', None)
+                if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    raise
+                from agents.transport import parse_retry_after
+                retry_after = parse_retry_after(_header(e, 'retry-after'))
+                delay = self._backoff(attempt, retry_after)
+                if status == 429:
+                    # The limits are shared, so everyone backs off, not just this request
+                    self.limiter.pause(delay)
+                    tracer.count('llm.rate_limited')
+                else:
+                    # The failed attempt used no tokens
+                    self.limiter.refund(reserved)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if not stream:
+                usage = getattr(response, 'usage', None)
+                used = (getattr(usage, 'prompt_tokens', None) or prompt_tokens) + \
+                    (getattr(usage, 'completion_tokens', None) or 0)
+                self.limiter.refund(reserved - used)
+            return response
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def complete_many(self, prompts: Sequence[str], model: str, temperature: float, max_tokens: int,
+                      cache: Optional[CompletionCache] = None,
+                      validate: Optional[Callable[[str], bool]] = None) -> List[Union[str, Exception]]:
+        """
+        Run independent single-message prompts concurrently, in input order.
+        Each result is the stripped completion text, or the exception that
+        request raised. Cached prompts and duplicates are sent only once.
+        """
+        results: List[Union[str, Exception, None]] = [None] * len(prompts)
+        pending: Dict[str, List[int]] = {}
+        for index, prompt in enumerate(prompts):
+            key = CompletionCache.make_key(model, temperature, max_tokens, prompt)
+            content = cache.get(key) if cache else None
+            if content is not None:
+                with cache._lock:
+                    cache.hits += 1
+                tracer.count('llm.cache_hits')
+                results[index] = content
+            else:
+                pending.setdefault(key, []).append(index)
+
+        futures = {}
+        for key, indexes in pending.items():
+            prompt = prompts[indexes[0]]
+            if cache:
+                with cache._lock:
+                    cache.misses += 1
+            futures[key] = self.submit(messages=[{"role": "user", "content": prompt}], model=model,
+                                       temperature=temperature, max_tokens=max_tokens)
+
+        with tracer.span("llm.complete_many", model=model, prompts=len(prompts), sent=len(futures)):
+            for key, future in futures.items():
+                prompt = prompts[pending[key][0]]
+                try:
+                    response = future.result()
+                    content = response.choices[0].message.content.strip()
+                    usage = getattr(response, 'usage', None)
+                    tracer.count('llm.calls')
+                    tracer.count('llm.tokens_sent', getattr(usage, 'prompt_tokens', None) or estimate_tokens(prompt))
+                    tracer.count('llm.tokens_received',
+                                 getattr(usage, 'completion_tokens', None) or estimate_tokens(content))
+                    if cache and (validate is None or validate(content)):
+                        cache.put(key, content)
+                    result = content
+                except Exception as e:
+                    result = e
+                for index in pending[key]:
+                    results[index] = result
+        return results
+
+    def close(self):
+        if self._loop is not None:
+            close = getattr(self._backend, 'close', None)
+            if close is not None and asyncio.iscoroutinefunction(close):
+                asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+def _api_key() -> Optional[str]:
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key or api_key == "your_actual_groq_api_key_here":
+        return None
+    return api_key
+
+
+def _header(error: Exception, name: str) -> Optional[str]:
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    return headers.get(name) if headers is not None else None
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def shared_client() -> LLMClient:
+    """
+    Process-wide LLMClient used by agents that are not given one
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient()
+        return _shared_client
+
+
+class StubError(Exception):
+    """
+    Error raised by StubBackend, shaped like the Groq client's status errors
+    """
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"stub error {status_code}")
+        self.status_code = status_code
+        headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class StubBackend:
+    """
+    Offline stand-in for AsyncGroq for tests and benchmarks. Every call
+    takes `latency` seconds plus `seconds_per_token` per completion token;
+    every `rate_limit_every`-th call fails with a 429. `responder(prompt)`
+    produces the reply; the default recognizes this project's decomposition,
+    map and synthesis prompts and answers them with valid JSON.
+    """
+    def __init__(self, latency: float = 0.05, seconds_per_token: float = 0.0,
+                 responder: Optional[Callable[[str], str]] = None, rate_limit_every: int = 0,
+                 retry_after: float = 0.1):
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.responder = responder or default_stub_response
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, messages: List[Dict], model: str, temperature: float = 0.0,
+                      max_tokens: int = 1024, stream: bool = False, **kwargs):
+        self.calls += 1
+        if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+            raise StubError(429, self.retry_after)
+        prompt = messages[-1]['content']
+        content = self.responder(prompt)
+        completion_tokens = min(estimate_tokens(content), max_tokens)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if stream:
+                return self._stream(content, completion_tokens)
+            await asyncio.sleep(self.latency + completion_tokens * self.seconds_per_token)
+        finally:
+            if not stream:
+                self.in_flight -= 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=estimate_tokens(prompt), completion_tokens=completion_tokens),
+        )
+
+    async def _stream(self, content: str, completion_tokens: int):
+        try:
+            await asyncio.sleep(self.latency)
+            pieces = re.findall(r'.{1,16}', content, re.S)
+            for piece in pieces:
+                await asyncio.sleep(completion_tokens * self.seconds_per_token / max(len(pieces), 1))
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+        finally:
+            self.in_flight -= 1
+
+
+def default_stub_response(prompt: str) -> str:
+    """
+    Plausible JSON reply to one of the pipeline's prompts
+    """
+    quoted = re.search(r'"([^"]+)"', prompt)
+    topic = quoted.group(1) if quoted else "the topic"
+    urls = re.findall(r'URL: (\S+?)\)', prompt)
+    if "JSON array of strings" in prompt:
+        return json.dumps([f"{topic} overview", f"{topic} benefits", f"{topic} challenges"])
+    if '"heading": "Short heading' in prompt:
+        return json.dumps({"heading": f"Findings on {topic}", "content": f"Summary of sources about {topic}.",
+                           "sources": urls})
+    return json.dumps({
+        "title": f"Research Report: {topic}",
+        "sections": [{"heading": "Overview", "content": f"Synthesized findings about {topic}.", "sources": urls}],
+        "conclusion": f"Conclusion about {topic}.",
+    })
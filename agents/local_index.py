@@ -0,0 +1,140 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its of on or that the this to was were what
+when where which who why will with about into over than then there these those their they them our
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+class LocalIndex:
+    """
+    On-disk inverted index over previously scraped sources, ranked with BM25.
+    Documents are added incrementally (re-adding a URL replaces it), so the
+    index grows as a side effect of normal research runs.
+    
+    Documents older than `max_age` seconds are not returned, so repeat
+    topics go back to the web and refresh their pages, and are purged when
+    the index is opened. Beyond `max_documents`, the oldest are evicted.
+    """
+    def __init__(self, index_dir: str = ".research_cache", k1: float = 1.5, b: float = 0.75,
+                 max_age: float = 7 * 24 * 3600, max_documents: int = 20000):
+        self.k1 = k1
+        self.b = b
+        self.max_age = max_age
+        self.max_documents = max_documents
+        os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(index_dir, "local_index.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                url TEXT UNIQUE NOT NULL,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                added_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+            CREATE INDEX IF NOT EXISTS documents_added ON documents (added_at);
+        """)
+        with self._lock:
+            self._delete_where("added_at < ?", (time.time() - max_age,))
+            self._db.commit()
+
+    def _delete_where(self, condition: str, params: tuple):
+        # Caller holds the lock and commits
+        doc_ids = [(row[0],) for row in self._db.execute(f"SELECT doc_id FROM documents WHERE {condition}", params)]
+        self._db.executemany("DELETE FROM postings WHERE doc_id = ?", doc_ids)
+        self._db.executemany("DELETE FROM documents WHERE doc_id = ?", doc_ids)
+
+    def add_document(self, url: str, title: str, content: str):
+        terms = Counter(tokenize(f"{title} {content}"))
+        with self._lock:
+            row = self._db.execute("SELECT doc_id FROM documents WHERE url = ?", (url,)).fetchone()
+            if row:
+                self._db.execute("DELETE FROM postings WHERE doc_id = ?", (row[0],))
+                self._db.execute("DELETE FROM documents WHERE doc_id = ?", (row[0],))
+            cursor = self._db.execute(
+                "INSERT INTO documents (url, title, content, length, added_at) VALUES (?, ?, ?, ?, ?)",
+                (url, title, content, sum(terms.values()), time.time())
+            )
+            self._db.executemany(
+                "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                [(term, cursor.lastrowid, tf) for term, tf in terms.items()]
+            )
+            count = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            if count > self.max_documents:
+                self._delete_where("doc_id IN (SELECT doc_id FROM documents ORDER BY added_at LIMIT ?)",
+                                   (count - self.max_documents,))
+            self._db.commit()
+
+    def search(self, query: str, max_results: int = 3, min_term_coverage: float = 0.6) -> List[Dict]:
+        """
+        Top documents by BM25 that contain at least `min_term_coverage` of
+        the distinct query terms, among those added within `max_age`
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            total_docs, total_length = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents WHERE added_at >= ?", (cutoff,)
+            ).fetchone()
+            if not total_docs:
+                return []
+            average_length = total_length / total_docs
+            scores: Dict[int, float] = {}
+            matched: Dict[int, int] = {}
+            for term in terms:
+                postings = self._db.execute(
+                    "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN documents d ON d.doc_id = p.doc_id "
+                    "WHERE p.term = ? AND d.added_at >= ?",
+                    (term, cutoff)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf, length in postings:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+                    matched[doc_id] = matched.get(doc_id, 0) + 1
+
+            required = math.ceil(len(terms) * min_term_coverage)
+            ranked = sorted(
+                (doc_id for doc_id in scores if matched[doc_id] >= required),
+                key=lambda doc_id: -scores[doc_id]
+            )[:max_results]
+            results = []
+            for doc_id in ranked:
+                url, title, content = self._db.execute(
+                    "SELECT url, title, content FROM documents WHERE doc_id = ?", (doc_id,)
+                ).fetchone()
+                results.append({'url': url, 'title': title, 'content': content, 'score': round(scores[doc_id], 3)})
+            return results
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,138 @@
+import re
+from typing import TYPE_CHECKING, Callable, Dict, List, Sequence
+from agents.llm_cache import estimate_tokens
+from agents.local_index import tokenize
+from agents.source_document import with_content
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+class PassageRanker:
+    """
+    Splits source text into sentence-aligned passages, scores them with
+    BM25 against the original query and the sub-queries, and packs the
+    best passages into a prompt token budget. Scoring is vectorized over a
+    passages x query-terms matrix, so only terms that appear in a query
+    are ever counted.
+    """
+    def __init__(self, chunk_chars: int = 400, k1: float = 1.2, b: float = 0.75):
+        self.chunk_chars = chunk_chars
+        self.k1 = k1
+        self.b = b
+
+    def split(self, text: str) -> List[str]:
+        """
+        Passages of about `chunk_chars` characters, broken at sentence ends
+        where possible
+        """
+        passages = []
+        current = ""
+        for sentence in SENTENCE_END.split(text.strip()):
+            while len(sentence) > self.chunk_chars:
+                # A run-on "sentence" (menus, tables) is cut at a word boundary
+                cut = sentence.rfind(" ", 0, self.chunk_chars)
+                cut = cut if cut > 0 else self.chunk_chars
+                if current:
+                    passages.append(current)
+                    current = ""
+                passages.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            if current and len(current) + len(sentence) + 1 > self.chunk_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+        if current:
+            passages.append(current)
+        return passages
+
+    def score(self, passages: Sequence[str], queries: Sequence[str]) -> "np.ndarray":
+        """
+        BM25 score of every passage for every query, shape (passages, queries)
+        """
+        import numpy as np
+
+        vocabulary: Dict[str, int] = {}
+        query_terms = []
+        for query in queries:
+            terms = set(tokenize(query))
+            query_terms.append([vocabulary.setdefault(term, len(vocabulary)) for term in terms])
+        scores = np.zeros((len(passages), len(queries)), dtype=np.float32)
+        if not passages or not vocabulary:
+            return scores
+
+        rows, cols, lengths = [], [], np.empty(len(passages), dtype=np.float32)
+        for row, passage in enumerate(passages):
+            tokens = tokenize(passage)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                col = vocabulary.get(token)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        tf = np.zeros((len(passages), len(vocabulary)), dtype=np.float32)
+        np.add.at(tf, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1)
+
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((len(passages) - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(float(lengths.mean()), 1.0))
+        weights = idf * tf * (self.k1 + 1) / (tf + norm[:, None])
+
+        query_matrix = np.zeros((len(queries), len(vocabulary)), dtype=np.float32)
+        for index, term_cols in enumerate(query_terms):
+            query_matrix[index, term_cols] = 1
+        return weights @ query_matrix.T
+
+    def pack(self, collected_data: List[Dict], original_query: str, sub_queries: Sequence[str],
+             budget_tokens: int, render: Callable[[int, Dict], str]) -> str:
+        """
+        Prompt research data made of the highest-scoring passages that fit
+        `budget_tokens`. A passage scores its BM25 match with the original
+        query plus its best match among the sub-queries. Each relevant
+        source first gets its best passage, then the remaining budget goes
+        to the best passages overall; passages matching no query term are
+        left out. Sources are rendered with `render(index, data)` in
+        arrival order, their passages in page order.
+        """
+        passages, owners = [], []
+        for source_index, data in enumerate(collected_data):
+            for passage in self.split(data['content']):
+                passages.append(passage)
+                owners.append(source_index)
+        if not passages:
+            return ""
+
+        scores = self.score(passages, [original_query] + list(sub_queries))
+        relevance = scores[:, 0] + (scores[:, 1:].max(axis=1) if scores.shape[1] > 1 else 0)
+        by_score = [int(i) for i in (-relevance).argsort(kind="stable") if relevance[i] > 0]
+        if not by_score:
+            # Nothing matches the queries: keep page order, leading passages first
+            first = {}
+            for index, owner in enumerate(owners):
+                first.setdefault(owner, index)
+            by_score = sorted(range(len(passages)), key=lambda i: (i - first[owners[i]], i))
+        best_per_source = {}
+        for index in by_score:
+            best_per_source.setdefault(owners[index], index)
+        leaders = set(best_per_source.values())
+        order = list(best_per_source.values()) + [i for i in by_score if i not in leaders]
+
+        header_tokens = {source_index: estimate_tokens(render(source_index, with_content(data, "")))
+                         for source_index, data in enumerate(collected_data)}
+        chosen: Dict[int, List[int]] = {}
+        used = 0
+        for index in order:
+            owner = owners[index]
+            cost = estimate_tokens(passages[index]) + (0 if owner in chosen else header_tokens[owner])
+            if used + cost > budget_tokens:
+                continue
+            chosen.setdefault(owner, []).append(index)
+            used += cost
+
+        parts = []
+        for number, owner in enumerate(sorted(chosen)):
+            content = " ... ".join(passages[index] for index in sorted(chosen[owner]))
+            parts.append(render(number, with_content(collected_data[owner], content)))
+        return "\n\n".join(parts)
@@ -0,0 +1,208 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Dict, FrozenSet, Optional
+from agents.local_index import STOPWORDS, TOKEN
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _stem(word: str) -> str:
+    # Plural "s" only; enough to match "impacts"/"impact", "renewables"/"renewable"
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+# Framing words that do not change what a query is about ("impact of X",
+# "role of X", "how X is changing Y"): only queries whose other terms are
+# identical are compared at all
+GENERIC_TERMS = frozenset(_stem(word) for word in """
+impact effect influence role implication overview analysis review summary introduction guide study research
+report trend development latest recent current today new state future outlook explained understanding
+changing transforming shaping affecting affect
+""".split())
+
+# Weight of a generic term in query vectors: framing words still count,
+# but less than the subject
+GENERIC_WEIGHT = 0.5
+
+
+def query_terms(query: str) -> FrozenSet[str]:
+    """
+    Lowercase, singular words of the query without punctuation, possessives
+    or stopwords. Numbers are kept, even single digits.
+    """
+    words = TOKEN.findall(query.lower().replace("'s", " ").replace("\u2019s", " "))
+    return frozenset(_stem(word) for word in words if word not in STOPWORDS and (len(word) > 1 or word.isdigit()))
+
+
+def normalize_query(query: str) -> str:
+    """
+    Order-insensitive canonical form ("AI's impact on healthcare" and
+    "Impact of AI in healthcare" both become "ai healthcare impact")
+    """
+    return " ".join(sorted(query_terms(query)))
+
+
+def subject_key(query: str) -> str:
+    """
+    The normalized query without its generic framing words
+    """
+    return " ".join(sorted(query_terms(query) - GENERIC_TERMS))
+
+
+def config_key(config: Optional[Dict]) -> str:
+    return json.dumps(config or {}, sort_keys=True)
+
+
+def query_vector(normalized: str, dims: int = 1024) -> "np.ndarray":
+    """
+    L2-normalized hashed feature vector of whole words plus character
+    trigrams, so inflections ("impact"/"impacts") still overlap. Generic
+    terms are weighted by GENERIC_WEIGHT.
+    """
+    import numpy as np
+
+    vector = np.zeros(dims, dtype=np.float32)
+    for word in normalized.split():
+        weight = GENERIC_WEIGHT if word in GENERIC_TERMS else 1.0
+        vector[zlib.crc32(f"w:{word}".encode("utf-8")) % dims] += weight
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(f"c:{padded[i:i + 3]}".encode("utf-8")) % dims] += 0.25 * weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class QueryCache:
+    """
+    Semantic cache of finished research results. Candidates must share the
+    query's subject (its terms other than GENERIC_TERMS, so "rural India"
+    never matches "rural Kenya") and run configuration (search backend,
+    source limit, ...); among those, matches are ranked by cosine similarity
+    between hashed n-gram vectors of the normalized queries.
+
+    A match at or above `reuse_threshold` (or with the same normalized
+    terms) is close enough to return its synthesized content as is; one at
+    or above `warm_threshold` only supplies a warm start (the earlier run's
+    sources). Entries older than `ttl` seconds are ignored and purged;
+    beyond `max_entries`, the least recently used are evicted.
+    """
+    def __init__(self, cache_dir: str = ".research_cache", reuse_threshold: float = 0.92,
+                 warm_threshold: float = 0.8, ttl: float = 24 * 3600, max_entries: int = 1000, dims: int = 1024):
+        self.reuse_threshold = reuse_threshold
+        self.warm_threshold = warm_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.dims = dims
+        self.hits = 0
+        self.warm_starts = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "query_cache.sqlite3"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                entry_id INTEGER PRIMARY KEY,
+                query TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                config TEXT NOT NULL,
+                run_id TEXT,
+                synthesis TEXT NOT NULL,
+                reports TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_subject ON results (config, subject)")
+        self._db.commit()
+
+    def lookup(self, query: str, config: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Best fresh match on the same subject and config at or above
+        warm_threshold, as a dict with the stored query, run_id, synthesis,
+        reports, similarity, age_s and 'reuse' (True when it is above
+        reuse_threshold), or None
+        """
+        import numpy as np
+
+        terms = query_terms(query)
+        subject = " ".join(sorted(terms - GENERIC_TERMS))
+        if not subject:
+            with self._lock:
+                self.misses += 1
+            return None
+        normalized = " ".join(sorted(terms))
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT entry_id, query, normalized, run_id, synthesis, reports, created_at FROM results "
+                "WHERE config = ? AND subject = ? AND created_at > ?",
+                (config_key(config), subject, now - self.ttl)
+            ).fetchall()
+            if not rows:
+                self.misses += 1
+                return None
+            # One entry per normalized query, so candidates are few; vectors are cheap to rebuild
+            vectors = np.vstack([query_vector(row[2], self.dims) for row in rows])
+            similarities = vectors @ query_vector(normalized, self.dims)
+            best = int(similarities.argmax())
+            similarity = 1.0 if rows[best][2] == normalized else float(similarities[best])
+            if similarity < self.warm_threshold:
+                self.misses += 1
+                return None
+            row = rows[best]
+            self._db.execute("UPDATE results SET accessed_at = ? WHERE entry_id = ?", (now, row[0]))
+            self._db.commit()
+            reuse = similarity >= self.reuse_threshold
+            if reuse:
+                self.hits += 1
+            else:
+                self.warm_starts += 1
+        return {
+            'query': row[1],
+            'run_id': row[3],
+            'synthesis': json.loads(row[4]),
+            'reports': json.loads(row[5]),
+            'similarity': round(similarity, 4),
+            'age_s': round(now - row[6], 1),
+            'reuse': reuse,
+        }
+
+    def put(self, query: str, synthesis: Dict, reports: Dict[str, str], run_id: Optional[str] = None,
+            config: Optional[Dict] = None):
+        terms = query_terms(query)
+        subject = " ".join(sorted(terms - GENERIC_TERMS))
+        if not subject:
+            return
+        normalized = " ".join(sorted(terms))
+        key = config_key(config)
+        now = time.time()
+        with self._lock:
+            # One entry per normalized query and config: the newest result replaces the old one
+            self._db.execute("DELETE FROM results WHERE normalized = ? AND config = ?", (normalized, key))
+            self._db.execute(
+                "INSERT INTO results (query, normalized, subject, config, run_id, synthesis, reports, created_at, "
+                "accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (query, normalized, subject, key, run_id, json.dumps(synthesis), json.dumps(reports), now, now)
+            )
+            self._db.execute("DELETE FROM results WHERE created_at <= ?", (now - self.ttl,))
+            self._db.execute("""
+                DELETE FROM results WHERE entry_id IN (
+                    SELECT entry_id FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return {'hits': self.hits, 'warm_starts': self.warm_starts, 'misses': self.misses, 'entries': entries}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,16 +1,23 @@
-import os
-from groq import Groq
-from typing import List
+import re
+import json
+from typing import Iterator, List, Optional
+from agents.llm_cache import CompletionCache, chat_completion, chat_completion_stream, strip_code_fence, is_json
+from agents.llm_client import LLMClient, shared_client
+from agents.tracing import traced
+
+# Next element of a streamed JSON array of strings: a string literal, or the closing bracket
+ARRAY_ITEM = re.compile(r'\s*,?\s*(?:("(?:[^"\\]|\\.)*")|(\]))')
 
 class QueryProcessor:
-    def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if api_key and api_key != "your_actual_groq_api_key_here":
-            self.client = Groq(api_key=api_key)
-        else:
+    def __init__(self, llm_cache: Optional[CompletionCache] = None, llm_client: Optional[LLMClient] = None):
+        self.llm_cache = llm_cache
+        # Rate-limited client shared with the other agents
+        self.client = llm_client if llm_client is not None else shared_client()
+        if not self.client.available:
             self.client = None
             print("Warning: Groq API key not found. Using fallback decomposition method.")
     
+    @traced("query.decompose")
     def decompose_query(self, query: str) -> List[str]:
         """
         Decompose a broad query into 3-5 focused sub-queries
@@ -18,8 +25,83 @@ class QueryProcessor:
         if not self.client:
             print("Using fallback decomposition due to missing API key")
             return self._fallback_decomposition(query)
+        
+        try:
+            content = chat_completion(
+                self.client, self._decomposition_prompt(query),
+                model="llama3-8b-8192",
+                temperature=0.5,
+                max_tokens=200,
+                cache=self.llm_cache,
+                validate=is_json,
+            )
             
-        prompt = f"""
+            # Parse as JSON, handling potential markdown code blocks
+            sub_queries = json.loads(strip_code_fence(content))
+            return sub_queries[:5]  # Limit to 5 sub-queries maximum
+            
+        except Exception as e:
+            print(f"Error in decompose_query: {e}")
+            # Fallback to manual decomposition
+            return self._fallback_decomposition(query)
+    
+    def iter_sub_queries(self, query: str) -> Iterator[str]:
+        """
+        Yield sub-queries one at a time as the LLM streams its JSON array,
+        so that searching can start before decomposition has finished
+        """
+        if not self.client:
+            yield from self.decompose_query(query)
+            return
+        
+        yielded = 0
+        seen = set()
+        try:
+            buffer = ""
+            position = None  # scan offset, set once the array has opened
+            closed = False
+            for delta in chat_completion_stream(
+                self.client, self._decomposition_prompt(query),
+                model="llama3-8b-8192",
+                temperature=0.5,
+                max_tokens=200,
+                cache=self.llm_cache,
+                validate=is_json,
+            ):
+                buffer += delta
+                if closed:
+                    # Anything after the array (e.g. a note quoting sub-queries) is not a sub-query
+                    continue
+                if position is None:
+                    if "[" not in buffer:
+                        continue
+                    position = buffer.index("[") + 1
+                # Emit every element that has been closed so far, up to the array's "]"
+                while True:
+                    match = ARRAY_ITEM.match(buffer, position)
+                    if not match:
+                        break
+                    position = match.end()
+                    if match.group(2):
+                        closed = True
+                        break
+                    sub_query = json.loads(match.group(1))
+                    key = " ".join(sub_query.lower().split())
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if yielded < 5:  # Limit to 5 sub-queries maximum
+                        yielded += 1
+                        yield sub_query
+        except Exception as e:
+            print(f"Error in iter_sub_queries: {e}")
+        
+        if not yielded:
+            # Fallback to manual decomposition
+            yield from self._fallback_decomposition(query)
+    
+    def _decomposition_prompt(self, query: str) -> str:
+        return f"""
         Decompose the following broad research query into 3-5 focused sub-queries:
         "{query}"
         
@@ -33,36 +115,6 @@ class QueryProcessor:
         Input: "Impact of AI in healthcare"
         Output: ["AI applications in medical diagnosis", "Machine learning in patient care", "Ethical considerations of healthcare AI"]
         """
-        
-        try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model="llama3-8b-8192",
-                temperature=0.5,
-                max_tokens=200,
-            )
-            
-            # Extract the content and parse as JSON
-            import json
-            content = response.choices[0].message.content.strip()
-            # Handle potential markdown code blocks
-            if content.startswith("```json"):
-                content = content[7:-3]
-            elif content.startswith("```"):
-                content = content[3:-3]
-            
-            sub_queries = json.loads(content)
-            return sub_queries[:5]  # Limit to 5 sub-queries maximum
-            
-        except Exception as e:
-            print(f"Error in decompose_query: {e}")
-            # Fallback to manual decomposition
-            return self._fallback_decomposition(query)
     
     def _fallback_decomposition(self, query: str) -> List[str]:
         """
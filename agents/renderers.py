@@ -0,0 +1,127 @@
+import html
+import json
+from typing import Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+
+class Renderer(NamedTuple):
+    extension: str
+    render: Callable[[str, Dict, str], str]
+
+
+# Lightweight text renderers by format name. PDF is handled by ReportGenerator.
+RENDERERS: Dict[str, Renderer] = {}
+
+
+def register_renderer(name: str, extension: str):
+    """
+    Register `render(original_query, synthesized_content, generated_at) -> str`
+    as the writer for a report format
+    """
+    def decorator(render):
+        RENDERERS[name] = Renderer(extension, render)
+        return render
+    return decorator
+
+
+def iter_sections(synthesized_content: Dict) -> Iterator[Tuple[str, str, List[str]]]:
+    """
+    (heading, content, sources) of each section, with defaults for missing
+    fields: an LLM or a partial map-reduce result may leave some out
+    """
+    for number, section in enumerate(synthesized_content.get('sections') or [], 1):
+        if not isinstance(section, dict):
+            continue
+        yield (str(section.get('heading') or f"Section {number}"), str(section.get('content') or ""),
+               list(section.get('sources') or []))
+
+
+def _paragraphs(text: str):
+    return [para.strip() for para in str(text).split('\n\n') if para.strip()]
+
+
+@register_renderer("md", ".md")
+def render_markdown(original_query: str, synthesized_content: Dict, generated_at: str) -> str:
+    lines = [
+        f"# {synthesized_content.get('title', 'Research Report')}",
+        "",
+        f"**Original Query:** {original_query}  ",
+        f"**Generated on:** {generated_at}",
+        "",
+    ]
+    for heading, content, sources in iter_sections(synthesized_content):
+        lines += [f"## {heading}", ""]
+        for para in _paragraphs(content):
+            lines += [para, ""]
+        if sources:
+            lines += ["**Sources:**", ""]
+            lines += [f"- <{url}>" for url in sources]
+            lines.append("")
+    conclusion = synthesized_content.get('conclusion')
+    if conclusion:
+        lines += ["## Conclusion", "", conclusion, ""]
+    return "\n".join(lines)
+
+
+@register_renderer("html", ".html")
+def render_html(original_query: str, synthesized_content: Dict, generated_at: str) -> str:
+    escape = html.escape
+    title = escape(synthesized_content.get('title', 'Research Report'))
+    parts = [
+        "<!DOCTYPE html>",
+        "<html lang=\"en\">",
+        "<head>",
+        "<meta charset=\"utf-8\">",
+        f"<title>{title}</title>",
+        "<style>body{max-width:48rem;margin:2rem auto;font-family:Georgia,serif;line-height:1.5}"
+        "h1{text-align:center}.meta{color:#555}p{text-indent:1.25rem}</style>",
+        "</head>",
+        "<body>",
+        f"<h1>{title}</h1>",
+        f"<p class=\"meta\">Original Query: {escape(original_query)}<br>Generated on: {escape(generated_at)}</p>",
+    ]
+    for heading, content, sources in iter_sections(synthesized_content):
+        parts.append(f"<h2>{escape(heading)}</h2>")
+        parts += [f"<p>{escape(para)}</p>" for para in _paragraphs(content)]
+        if sources:
+            parts.append("<p><b>Sources:</b></p><ul>")
+            parts += [f"<li><a href=\"{escape(str(url))}\">{escape(str(url))}</a></li>" for url in sources]
+            parts.append("</ul>")
+    conclusion = synthesized_content.get('conclusion')
+    if conclusion:
+        parts += ["<h2>Conclusion</h2>", f"<p>{escape(conclusion)}</p>"]
+    parts += ["</body>", "</html>", ""]
+    return "\n".join(parts)
+
+
+@register_renderer("json", ".json")
+def render_json(original_query: str, synthesized_content: Dict, generated_at: str) -> str:
+    return json.dumps({
+        'original_query': original_query,
+        'generated_at': generated_at,
+        'report': synthesized_content,
+    }, indent=2, ensure_ascii=False)
+
+
+@register_renderer("txt", ".txt")
+def render_text(original_query: str, synthesized_content: Dict, generated_at: str) -> str:
+    lines = [
+        "RESEARCH REPORT",
+        f"Title: {synthesized_content.get('title', 'Research Report')}",
+        f"Original Query: {original_query}",
+        f"Generated on: {generated_at}",
+        "=" * 50,
+        "",
+    ]
+    for heading, content, sources in iter_sections(synthesized_content):
+        lines.append(heading)
+        lines.append("-" * len(heading))
+        lines.append(content)
+        lines.append("")
+        if sources:
+            lines.append("Sources:")
+            lines += [f"  • {url}" for url in sources]
+            lines.append("")
+    conclusion = synthesized_content.get('conclusion')
+    if conclusion:
+        lines += ["CONCLUSION", "-" * 10, conclusion]
+    return "\n".join(lines) + "\n"
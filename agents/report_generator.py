@@ -1,135 +1,307 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import os
+import re
+import threading
+from agents.tracing import traced, tracer
+from agents.renderers import RENDERERS, iter_sections
+
+if TYPE_CHECKING:
+    from reportlab.lib.styles import ParagraphStyle
+
+# Formats ReportGenerator can write: PDF plus every registered lightweight renderer
+REPORT_FORMATS = ("pdf",) + tuple(RENDERERS)
+
+# Paragraph styles are immutable once built, so each process builds them
+# once instead of on every report. ReportLab itself is only imported here
+# and in build_pdf, so runs that write no PDF never load it.
+_STYLES = None
+
+
+def get_report_styles() -> Dict[str, "ParagraphStyle"]:
+    """
+    Shared sample stylesheet plus the report's custom styles
+    """
+    global _STYLES
+    if _STYLES is None:
+        from reportlab.lib.enums import TA_CENTER, TA_LEFT
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        
+        styles = getSampleStyleSheet()
+        
+        # Custom styles
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            spaceAfter=30,
+            alignment=TA_CENTER
+        )
+        
+        heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            spaceAfter=12,
+            alignment=TA_LEFT
+        )
+        
+        content_style = ParagraphStyle(
+            'CustomContent',
+            parent=styles['Normal'],
+            fontSize=12,
+            spaceAfter=12,
+            alignment=TA_LEFT,
+            firstLineIndent=20
+        )
+        
+        _STYLES = {
+            'normal': styles['Normal'],
+            'title': title_style,
+            'heading': heading_style,
+            'content': content_style,
+        }
+    return _STYLES
+
+
+def build_pdf(filepath: str, original_query: str, synthesized_content: Dict,
+              generated_at: Optional[str] = None) -> str:
+    """
+    Lay out and write one PDF report. Module-level so it can run in a worker process.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+    
+    generated_at = generated_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    doc = SimpleDocTemplate(filepath, pagesize=letter)
+    styles = get_report_styles()
+    
+    # Build the document content
+    story = []
+    
+    # Title page
+    story.append(Paragraph(synthesized_content.get('title', 'Research Report'), styles['title']))
+    story.append(Spacer(1, 0.5*inch))
+    story.append(Paragraph(f"Original Query: {original_query}", styles['normal']))
+    story.append(Spacer(1, 0.2*inch))
+    story.append(Paragraph(f"Generated on: {generated_at}", styles['normal']))
+    story.append(PageBreak())
+    
+    # Table of contents would go here in a more advanced version
+    
+    # Main content sections
+    for heading, content, sources in iter_sections(synthesized_content):
+        story.append(Paragraph(heading, styles['heading']))
+        story.append(Spacer(1, 0.1*inch))
+        
+        # Split content into paragraphs
+        paragraphs = content.split('\n\n')
+        for para in paragraphs:
+            if para.strip():
+                story.append(Paragraph(para.strip(), styles['content']))
+                story.append(Spacer(1, 0.1*inch))
+        
+        # Add sources
+        if sources:
+            sources_text = "<br/>".join([f"• <link href='{url}'>{url}</link>" for url in sources])
+            story.append(Paragraph(f"<b>Sources:</b><br/>{sources_text}", styles['normal']))
+            story.append(Spacer(1, 0.2*inch))
+    
+    # Conclusion
+    conclusion = synthesized_content.get('conclusion')
+    if conclusion:
+        story.append(Paragraph("Conclusion", styles['heading']))
+        story.append(Spacer(1, 0.1*inch))
+        story.append(Paragraph(conclusion, styles['content']))
+    
+    # Build PDF
+    doc.build(story)
+    return filepath
+
+
+def safe_filename(text: str, max_length: int = 80) -> str:
+    """
+    Filename stem for untrusted text such as a query posted to the service:
+    only word characters, dots and dashes, no ".." or leading dots, capped
+    at `max_length`, so it can never name a path outside the output directory
+    """
+    name = re.sub(r'[^\w.-]+', '_', text.strip())
+    name = re.sub(r'\.{2,}', '.', name).strip('._-')
+    return name[:max_length].rstrip('._-') or "report"
+
+
+def parse_formats(value: str) -> List[str]:
+    """
+    Split a comma-separated format list such as "pdf,md,json", rejecting unknown formats
+    """
+    formats = []
+    for name in value.split(','):
+        name = name.strip().lower()
+        if name == "markdown":
+            name = "md"
+        if name not in REPORT_FORMATS:
+            raise ValueError(f"unknown report format '{name}' (choose from {', '.join(REPORT_FORMATS)})")
+        if name not in formats:
+            formats.append(name)
+    return formats
+
 
 class ReportGenerator:
-    def __init__(self, output_dir: str = "reports"):
+    def __init__(self, output_dir: str = "reports", processes: int = 0, formats: Sequence[str] = ("pdf",)):
+        """
+        With processes > 0, PDF layout runs in a pool of worker processes.
+        ReportLab is CPU-bound and holds the GIL, so this lets concurrent
+        callers (batch mode) and `generate_many` render in parallel.
+        `formats` are the outputs `generate_reports` writes by default.
+        Styles (and ReportLab) are loaded with the first PDF.
+        """
         self.output_dir = output_dir
+        self.processes = processes
+        self.formats = list(formats)
+        self._pool = None
+        self._pool_lock = threading.Lock()
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
     
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Concurrent callers (batch mode, the service) must not each start a pool
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn, not fork: callers are usually multi-threaded (batch mode)
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, initializer=get_report_styles,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+    
+    def _report_path(self, original_query: str, extension: str = ".pdf", run_id: Optional[str] = None) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # The run ID keeps runs of the same query in the same second apart
+        suffix = f"_{safe_filename(run_id)}" if run_id else ""
+        filename = f"{safe_filename(original_query)}_{timestamp}{suffix}{extension}"
+        return os.path.join(self.output_dir, filename)
+    
+    @traced("report.render_pdf")
     def generate_pdf_report(self, original_query: str, synthesized_content: Dict) -> str:
         """
         Create a polished PDF report from the synthesized content
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{original_query.replace(' ', '_')}_{timestamp}.pdf"
-        filepath = os.path.join(self.output_dir, filename)
+        filepath = self._report_path(original_query)
         
         try:
-            # Create the PDF document
-            doc = SimpleDocTemplate(filepath, pagesize=letter)
-            styles = getSampleStyleSheet()
-            
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                spaceAfter=30,
-                alignment=TA_CENTER
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=16,
-                spaceAfter=12,
-                alignment=TA_LEFT
-            )
-            
-            content_style = ParagraphStyle(
-                'CustomContent',
-                parent=styles['Normal'],
-                fontSize=12,
-                spaceAfter=12,
-                alignment=TA_LEFT,
-                firstLineIndent=20
-            )
-            
-            # Build the document content
-            story = []
-            
-            # Title page
-            story.append(Paragraph(synthesized_content.get('title', 'Research Report'), title_style))
-            story.append(Spacer(1, 0.5*inch))
-            story.append(Paragraph(f"Original Query: {original_query}", styles['Normal']))
-            story.append(Spacer(1, 0.2*inch))
-            story.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-            story.append(PageBreak())
-            
-            # Table of contents would go here in a more advanced version
-            
-            # Main content sections
-            for section in synthesized_content.get('sections', []):
-                story.append(Paragraph(section['heading'], heading_style))
-                story.append(Spacer(1, 0.1*inch))
-                
-                # Split content into paragraphs
-                paragraphs = section['content'].split('\n\n')
-                for para in paragraphs:
-                    if para.strip():
-                        story.append(Paragraph(para.strip(), content_style))
-                        story.append(Spacer(1, 0.1*inch))
-                
-                # Add sources
-                if section.get('sources'):
-                    sources_text = "<br/>".join([f"• <link href='{url}'>{url}</link>" for url in section['sources']])
-                    story.append(Paragraph(f"<b>Sources:</b><br/>{sources_text}", styles['Normal']))
-                    story.append(Spacer(1, 0.2*inch))
-            
-            # Conclusion
-            conclusion = synthesized_content.get('conclusion')
-            if conclusion:
-                story.append(Paragraph("Conclusion", heading_style))
-                story.append(Spacer(1, 0.1*inch))
-                story.append(Paragraph(conclusion, content_style))
-            
-            # Build PDF
-            doc.build(story)
-            return filepath
+            if self.processes:
+                return self._get_pool().submit(build_pdf, filepath, original_query, synthesized_content).result()
+            return build_pdf(filepath, original_query, synthesized_content)
             
         except Exception as e:
             print(f"Error generating PDF report: {e}")
             # Fallback to simple text report
             return self._generate_text_report(original_query, synthesized_content, filepath)
     
+    def generate_reports(self, original_query: str, synthesized_content: Dict,
+                         formats: Optional[Sequence[str]] = None, run_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Write the synthesized content in each format (default: self.formats)
+        in one pass. All outputs share a base name, timestamp and `run_id`
+        (when given, so concurrent runs never share a file); the PDF is
+        laid out while the lightweight formats are written. Returns
+        {format: path}; a format that fails to render is left out, and a
+        failed PDF falls back to the text report.
+        """
+        formats = list(formats or self.formats)
+        base = self._report_path(original_query, "", run_id)
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        outputs = {}
+        
+        pdf_job = None
+        if "pdf" in formats:
+            if self.processes:
+                pdf_job = self._get_pool().submit(build_pdf, base + ".pdf", original_query, synthesized_content, generated_at)
+            else:
+                pdf_job = base + ".pdf"
+        
+        for name in formats:
+            if name == "pdf":
+                continue
+            renderer = RENDERERS.get(name)
+            if renderer is None:
+                print(f"Unknown report format '{name}', skipping")
+                continue
+            with tracer.span("report.render", format=name):
+                try:
+                    text = renderer.render(original_query, synthesized_content, generated_at)
+                except Exception as e:
+                    # One broken format must not cost the others
+                    print(f"Error rendering {name} report: {e}")
+                    continue
+                path = self._write_rendered(base + renderer.extension, text)
+            if path:
+                outputs[name] = path
+        
+        if pdf_job is not None:
+            with tracer.span("report.render", format="pdf"):
+                try:
+                    if isinstance(pdf_job, str):
+                        outputs["pdf"] = build_pdf(pdf_job, original_query, synthesized_content, generated_at)
+                    else:
+                        outputs["pdf"] = pdf_job.result()
+                except Exception as e:
+                    print(f"Error generating PDF report: {e}")
+                    if "txt" not in outputs:
+                        path = self._generate_text_report(original_query, synthesized_content, base + ".pdf")
+                        if path:
+                            outputs["txt"] = path
+        
+        # Keep the caller's format order
+        return {name: outputs[name] for name in formats + ["txt"] if name in outputs}
+    
+    def _write_rendered(self, filepath: str, text: str) -> Optional[str]:
+        try:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(text)
+            return filepath
+        except Exception as e:
+            print(f"Error writing report {filepath}: {e}")
+            return None
+    
+    def generate_many(self, reports: List[Tuple[str, Dict]]) -> List[str]:
+        """
+        Render several (original_query, synthesized_content) pairs, in
+        parallel when a process pool is configured. Paths keep input order.
+        """
+        if not self.processes:
+            return [self.generate_pdf_report(query, content) for query, content in reports]
+        
+        jobs = []
+        for query, content in reports:
+            filepath = self._report_path(query)
+            jobs.append((query, content, filepath, self._get_pool().submit(build_pdf, filepath, query, content)))
+        
+        paths = []
+        for query, content, filepath, future in jobs:
+            try:
+                paths.append(future.result())
+            except Exception as e:
+                print(f"Error generating PDF report: {e}")
+                paths.append(self._generate_text_report(query, content, filepath))
+        return paths
+    
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+    
     def _generate_text_report(self, original_query: str, synthesized_content: Dict, filepath: str) -> str:
         """
         Fallback method to generate a simple text report if PDF generation fails
         """
         text_filepath = filepath.replace('.pdf', '.txt')
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         try:
-            with open(text_filepath, 'w', encoding='utf-8') as f:
-                f.write(f"RESEARCH REPORT\\n")
-                f.write(f"Title: {synthesized_content.get('title', 'Research Report')}\\n")
-                f.write(f"Original Query: {original_query}\\n")
-                f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\\n")
-                f.write("=" * 50 + "\\n\\n")
-                
-                for section in synthesized_content.get('sections', []):
-                    f.write(f"{section['heading']}\\n")
-                    f.write("-" * len(section['heading']) + "\\n")
-                    f.write(f"{section['content']}\\n\\n")
-                    
-                    if section.get('sources'):
-                        f.write("Sources:\\n")
-                        for url in section['sources']:
-                            f.write(f"  • {url}\\n")
-                        f.write("\\n")
-                
-                conclusion = synthesized_content.get('conclusion')
-                if conclusion:
-                    f.write("CONCLUSION\\n")
-                    f.write("-" * 10 + "\\n")
-                    f.write(f"{conclusion}\\n")
-            
-            return text_filepath
+            text = RENDERERS["txt"].render(original_query, synthesized_content, generated_at)
         except Exception as e:
             print(f"Error generating text report: {e}")
-            return None
\ No newline at end of file
+            return None
+        return self._write_rendered(text_filepath, text)
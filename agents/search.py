@@ -0,0 +1,145 @@
+import json
+from typing import TYPE_CHECKING, Dict, List, Optional
+from urllib.parse import urlparse, parse_qs, quote_plus
+from agents.host_scheduler import HostScheduler
+from agents.http_cache import HttpCache
+from agents.local_index import LocalIndex
+from agents.tracing import tracer
+
+if TYPE_CHECKING:
+    # Type-only: importing requests is left to the first component that fetches
+    from agents.transport import Transport
+
+
+class SearchProvider:
+    """
+    Interface for search backends used by DataCollector.
+    `search` returns dicts with 'url' and 'title'; a backend may also
+    include 'content', in which case the page is not fetched again.
+    """
+    name = "base"
+
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        raise NotImplementedError
+
+
+class GoogleSearchProvider(SearchProvider):
+    """
+    Scrapes Google's result page (for demonstration; in a production
+    environment you might want to use a proper search API)
+    """
+    name = "google"
+
+    def __init__(self, transport: "Transport", scheduler: HostScheduler, cache: Optional[HttpCache] = None,
+                 base_url: str = "https://www.google.com/search"):
+        self.transport = transport
+        self.scheduler = scheduler
+        self.cache = cache
+        self.base_url = base_url
+
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        search_url = f"{self.base_url}?q={quote_plus(query)}&num={max_results}"
+        
+        if self.cache:
+            cached = self.cache.get(search_url, kind="search")
+            if cached and self.cache.is_fresh(cached):
+                self.cache.record_hit()
+                tracer.count('collector.cache_hits')
+                return json.loads(cached['body'])[:max_results]
+            self.cache.record_miss()
+            tracer.count('collector.cache_misses')
+        
+        from bs4 import BeautifulSoup
+        
+        with self.scheduler.slot(search_url):
+            response = self.transport.get(search_url)
+        tracer.count('collector.bytes_fetched', len(response.content))
+        soup = BeautifulSoup(response.content, 'html.parser')
+        
+        # Extract search results (this is a simplified approach)
+        results = []
+        for link in soup.find_all('a', href=True):
+            url = self._result_url(link['href'])
+            if url and self._is_valid_url(url):
+                results.append({
+                    'url': url,
+                    'title': link.get_text() or "No title"
+                })
+                if len(results) >= max_results:
+                    break
+        
+        # An empty page usually means we were blocked; don't remember that
+        if self.cache and results:
+            self.cache.put(search_url, json.dumps(results), kind="search")
+        return results
+    
+    def _result_url(self, href: str) -> Optional[str]:
+        """
+        Extract the target URL from Google's /url?q=... redirect links
+        """
+        if not href.startswith('/url?'):
+            return None
+        target = parse_qs(urlparse(href).query).get('q')
+        return target[0] if target else None
+    
+    def _is_valid_url(self, url: str) -> bool:
+        """
+        Check if URL is valid and scrapable
+        """
+        try:
+            parsed = urlparse(url)
+            return bool(parsed.netloc) and bool(parsed.scheme) and 'google' not in parsed.netloc
+        except ValueError:
+            return False
+
+
+class LocalIndexSearchProvider(SearchProvider):
+    """
+    Answers from previously scraped sources in the local BM25 index,
+    without touching the network
+    """
+    name = "local"
+
+    def __init__(self, index: LocalIndex, min_term_coverage: float = 0.6):
+        self.index = index
+        self.min_term_coverage = min_term_coverage
+
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        results = self.index.search(query, max_results, self.min_term_coverage)
+        tracer.count('collector.local_index_hits', len(results))
+        return results
+
+
+class ChainedSearchProvider(SearchProvider):
+    """
+    Queries providers in order, filling up to `max_results` unique URLs,
+    e.g. the local index first and the web only for what is missing.
+    Raises the last provider error when failures left it with no results.
+    """
+    name = "chained"
+
+    def __init__(self, providers: List[SearchProvider]):
+        self.providers = providers
+
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        results, seen, error = [], set(), None
+        for provider in self.providers:
+            if len(results) >= max_results:
+                break
+            try:
+                found = provider.search(query, max_results - len(results))
+            except Exception as e:
+                print(f"Error searching {provider.name} for '{query}': {e}")
+                error = e
+                continue
+            for result in found:
+                if result['url'] not in seen:
+                    seen.add(result['url'])
+                    results.append(result)
+        if error is not None and not results:
+            # Nothing found because a provider failed, not because there is nothing
+            raise error
+        return results[:max_results]
+
+
+SEARCH_BACKENDS = ("web", "local", "local+web")
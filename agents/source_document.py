@@ -0,0 +1,161 @@
+import sys
+import zlib
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+# Content shorter than this is kept as a plain string even when compressing:
+# below it zlib saves too little to pay for the decode on every access
+COMPRESS_MIN_CHARS = 512
+
+_FIELDS = ("url", "title", "content", "sub_query")
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class SourceDocument(Mapping):
+    """
+    Compact record of one collected source.
+
+    Read-only and dict-compatible: `doc['url']`, `doc.get('content', '')`,
+    `dict(doc)` and comparisons with plain dicts work as they did for the
+    {'url', 'title', 'content', 'sub_query'} dicts the agents pass around,
+    and any other keys (e.g. a search 'score') are kept in `extra`.
+
+    URLs, hosts and sub-queries are interned, so documents from the same
+    site or sub-query share one string, and no per-document __dict__ is
+    allocated. With `compress=True` the content is held as zlib-compressed
+    UTF-8 and decoded on access; `excerpt` decodes only the prefix it needs.
+    """
+    __slots__ = ("url", "host", "title", "sub_query", "extra", "_content", "_compressed")
+
+    def __init__(self, url: str, title: str = "", content: str = "", sub_query: Optional[str] = None,
+                 extra: Optional[Dict] = None, compress: bool = False):
+        self.url = _intern(url)
+        self.host = _intern(urlparse(url).netloc.lower()) if url else ""
+        self.title = title
+        self.sub_query = _intern(sub_query)
+        self.extra = extra or None
+        if compress and len(content) >= COMPRESS_MIN_CHARS:
+            self._content = zlib.compress(content.encode("utf-8"), 6)
+            self._compressed = True
+        else:
+            self._content = content
+            self._compressed = False
+
+    @classmethod
+    def from_dict(cls, data: Mapping, compress: bool = False) -> "SourceDocument":
+        if isinstance(data, SourceDocument) and data._compressed == compress:
+            return data
+        extra = {key: value for key, value in data.items() if key not in _FIELDS}
+        return cls(data['url'], data.get('title') or "", data.get('content') or "", data.get('sub_query'),
+                   extra, compress)
+
+    @property
+    def content(self) -> str:
+        if self._compressed:
+            return zlib.decompress(self._content).decode("utf-8")
+        return self._content
+
+    @property
+    def compressed(self) -> bool:
+        return self._compressed
+
+    def excerpt(self, max_chars: int) -> str:
+        """
+        The first `max_chars` characters of the content, decompressing no
+        more than needed (a UTF-8 character is at most 4 bytes)
+        """
+        if not self._compressed:
+            return self._content[:max_chars]
+        prefix = zlib.decompressobj().decompress(self._content, max_chars * 4)
+        return prefix.decode("utf-8", errors="ignore")[:max_chars]
+
+    def replace(self, **changes) -> "SourceDocument":
+        """
+        Copy with some fields changed; unchanged content is shared, not re-encoded
+        """
+        doc = SourceDocument.__new__(SourceDocument)
+        doc.url = self.url
+        doc.host = self.host
+        doc.title = changes.pop('title', self.title)
+        doc.sub_query = _intern(changes.pop('sub_query', self.sub_query))
+        doc._content = self._content
+        doc._compressed = self._compressed
+        if 'url' in changes:
+            url = changes.pop('url')
+            doc.url = _intern(url)
+            doc.host = _intern(urlparse(url).netloc.lower()) if url else ""
+        if 'content' in changes:
+            content = changes.pop('content')
+            if self._compressed and len(content) >= COMPRESS_MIN_CHARS:
+                doc._content = zlib.compress(content.encode("utf-8"), 6)
+            else:
+                doc._content = content
+                doc._compressed = False
+        doc.extra = dict(self.extra or {}, **changes) or None
+        return doc
+
+    def to_dict(self) -> Dict:
+        return dict(self)
+
+    def __getitem__(self, key: str):
+        if key == 'content':
+            return self.content
+        if key in _FIELDS:
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from _FIELDS
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(_FIELDS) + (len(self.extra) if self.extra is not None else 0)
+
+    def __repr__(self) -> str:
+        return f"SourceDocument(url={self.url!r}, title={self.title!r}, sub_query={self.sub_query!r})"
+
+    def __reduce__(self):
+        # Pickled (e.g. for a worker process) as its plain fields
+        return (SourceDocument, (self.url, self.title, self.content, self.sub_query, self.extra, self._compressed))
+
+
+def excerpt(data: Mapping, max_chars: int) -> str:
+    """
+    Content prefix of a SourceDocument or a plain source dict
+    """
+    if isinstance(data, SourceDocument):
+        return data.excerpt(max_chars)
+    return data['content'][:max_chars]
+
+
+def with_content(data: Mapping, content: str) -> Mapping:
+    """
+    The source with its content replaced, without decoding the old content
+    """
+    if isinstance(data, SourceDocument):
+        return data.replace(content=content)
+    return dict(data, content=content)
+
+
+def clean_source(data: Mapping) -> Optional[SourceDocument]:
+    """
+    A scraped source with whitespace normalized in its title and content,
+    as a SourceDocument, or None if no content is left
+    """
+    original = data.get('content', '')
+    content = " ".join(original.split())
+    if not content:
+        return None
+    document = data if isinstance(data, SourceDocument) else SourceDocument.from_dict(data)
+    title = " ".join((data.get('title') or "No title").split())
+    if content == original:
+        # Already clean: the cleaned record shares the raw one's content
+        return document.replace(title=title)
+    return document.replace(title=title, content=content)
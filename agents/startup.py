@@ -0,0 +1,61 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Sequence, Tuple
+
+# Third-party packages that are only imported once a run needs them
+LAZY_DEPENDENCIES = ("groq", "httpx", "requests", "bs4", "reportlab", "numpy")
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)\s*$')
+
+
+def _loaded(modules) -> list:
+    return sorted({name.split('.')[0] for name in modules} & set(LAZY_DEPENDENCIES))
+
+
+def import_profile(module: str = "main") -> Tuple[float, Dict[str, float]]:
+    """
+    Cold import cost of `module` in a fresh interpreter (python -X importtime):
+    total milliseconds, and self time in milliseconds per top-level package
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    total = 0.0
+    by_package: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        package = name.split('.')[0]
+        by_package[package] = by_package.get(package, 0.0) + int(self_us) / 1000
+        if name == module:
+            total = int(cumulative_us) / 1000
+    return total, by_package
+
+
+def profile_startup(steps: Sequence[Tuple[str, Callable]], module: str = "main", top: int = 10) -> str:
+    """
+    Report of the cold import cost of `module`, then of each initialization
+    step in order (timed in this process) with the heavy dependencies it
+    pulled in
+    """
+    total, by_package = import_profile(module)
+    lines = [f"Cold import of {module}: {total:.1f} ms",
+             f"Heavy dependencies loaded at import: {', '.join(_loaded(sys.modules)) or 'none'}",
+             "Heaviest packages (self time):"]
+    for package, ms in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {package:<28} {ms:8.1f} ms")
+    lines.append("Initialization, in order of first use:")
+    for label, step in steps:
+        before = set(sys.modules)
+        started = time.perf_counter()
+        step()
+        elapsed = (time.perf_counter() - started) * 1000
+        loaded = _loaded(set(sys.modules) - before)
+        lines.append(f"  {label:<28} {elapsed:8.1f} ms" + (f"  (loads {', '.join(loaded)})" if loaded else ""))
+    return "\n".join(lines)
@@ -0,0 +1,132 @@
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# Elements whose contents are never readable page text
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe"}
+
+# Chunk size used when a whole document is handed over at once, so the
+# streaming extractor can still stop early on large pages
+FEED_CHUNK_CHARS = 16 * 1024
+
+# Collector defaults; they shape results, so they are part of a run's
+# checkpoint key and must be known without building a DataCollector
+DEFAULT_EXTRACTOR = "streaming"
+DEFAULT_MAX_CONTENT_CHARS = 1500
+
+
+class TextExtractor:
+    """
+    Base class for HTML-to-text backends.
+    Feed HTML incrementally with `feed`, which returns True once the
+    extractor has enough text, then call `close` for the clean text.
+    """
+    def __init__(self, max_chars: Optional[int] = None):
+        self.max_chars = max_chars
+
+    def feed(self, html: str) -> bool:
+        raise NotImplementedError
+
+    def close(self) -> str:
+        raise NotImplementedError
+
+    def extract(self, html: str) -> str:
+        """
+        Convenience wrapper for a complete document
+        """
+        for start in range(0, len(html), FEED_CHUNK_CHARS):
+            if self.feed(html[start:start + FEED_CHUNK_CHARS]):
+                break
+        return self.close()
+
+
+class SoupExtractor(TextExtractor):
+    """
+    Original BeautifulSoup path: build the full tree, drop script/style, get_text
+    """
+    def __init__(self, max_chars: Optional[int] = None):
+        super().__init__(max_chars)
+        self._buffer: List[str] = []
+
+    def feed(self, html: str) -> bool:
+        self._buffer.append(html)
+        return False
+
+    def close(self) -> str:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup("".join(self._buffer), 'html.parser')
+        self._buffer = []
+        
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        # Get text content
+        text = soup.get_text(separator=' ', strip=True)
+        
+        # Clean up text
+        lines = (line.strip() for line in text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        text = ' '.join(chunk for chunk in chunks if chunk)
+        
+        return text[:self.max_chars] if self.max_chars else text
+
+
+class StreamingExtractor(TextExtractor, HTMLParser):
+    """
+    Incremental tokenizer-based extractor. Text inside SKIP_TAGS is dropped
+    as it streams past without building a tree, and parsing stops as soon
+    as `max_chars` of clean text have been collected.
+    """
+    def __init__(self, max_chars: Optional[int] = None):
+        TextExtractor.__init__(self, max_chars)
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self._parts: List[str] = []
+        self._length = 0
+        self._skip_depth = 0
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth or self.done:
+            return
+        text = ' '.join(data.split())
+        if not text:
+            return
+        self._parts.append(text)
+        self._length += len(text) + 1
+        if self.max_chars and self._length >= self.max_chars:
+            self.done = True
+
+    def feed(self, html: str) -> bool:
+        if not self.done:
+            HTMLParser.feed(self, html)
+        return self.done
+
+    def close(self) -> str:
+        if not self.done:
+            HTMLParser.close(self)
+        text = ' '.join(self._parts)
+        return text[:self.max_chars] if self.max_chars else text
+
+
+EXTRACTORS = {
+    "soup": SoupExtractor,
+    "streaming": StreamingExtractor,
+}
+
+
+def get_extractor(name: str = DEFAULT_EXTRACTOR, max_chars: Optional[int] = None) -> TextExtractor:
+    """
+    Build a fresh extractor for one document
+    """
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown text extractor '{name}'. Available: {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name](max_chars=max_chars)
@@ -0,0 +1,166 @@
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+
+class _NullSpan:
+    """
+    Shared no-op span handed out while tracing is disabled
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, args: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._record(self, end_ns)
+        return False
+
+    def set(self, key, value):
+        """
+        Attach a value (bytes, tokens, cache hit...) to the span
+        """
+        self.args[key] = value
+
+
+class Tracer:
+    """
+    Lightweight span and counter recorder for the research pipeline.
+    While disabled, `span` returns a shared no-op object and `count` returns
+    immediately, so instrumentation costs one attribute check per call.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._origin_ns = time.perf_counter_ns()
+        self.spans: List[Dict] = []
+        self.counters: Dict[str, float] = {}
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def count(self, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _record(self, span: Span, end_ns: int):
+        event = {
+            'name': span.name,
+            'start_us': (span.start_ns - self._origin_ns) / 1000,
+            'duration_us': (end_ns - span.start_ns) / 1000,
+            'thread': threading.get_ident(),
+            'thread_name': threading.current_thread().name,
+            'args': span.args,
+        }
+        with self._lock:
+            self.spans.append(event)
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.counters = {}
+            self._origin_ns = time.perf_counter_ns()
+
+    def export_chrome_trace(self, path: str):
+        """
+        Write spans and counters in Chrome trace event format
+        (open with chrome://tracing or https://ui.perfetto.dev)
+        """
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        events = []
+        thread_names = {}
+        for span in spans:
+            thread_names[span['thread']] = span['thread_name']
+            events.append({
+                'name': span['name'],
+                'cat': span['name'].split('.')[0],
+                'ph': 'X',
+                'ts': span['start_us'],
+                'dur': span['duration_us'],
+                'pid': pid,
+                'tid': span['thread'],
+                'args': span['args'],
+            })
+        for tid, name in thread_names.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        end_us = max((span['start_us'] + span['duration_us'] for span in spans), default=0)
+        for name, value in counters.items():
+            events.append({'name': name, 'ph': 'C', 'ts': end_us, 'pid': pid, 'args': {'value': value}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counters': counters}}, f)
+
+    def summary(self) -> str:
+        """
+        End-of-run table of span timings per name, followed by counters
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        by_name: Dict[str, List[float]] = {}
+        for span in spans:
+            by_name.setdefault(span['name'], []).append(span['duration_us'] / 1000)
+
+        lines = [f"{'span':<28} {'count':>6} {'total ms':>10} {'mean ms':>10} {'p50 ms':>10} {'max ms':>10}"]
+        for name in sorted(by_name, key=lambda n: -sum(by_name[n])):
+            durations = sorted(by_name[name])
+            lines.append(
+                f"{name:<28} {len(durations):>6} {sum(durations):>10.1f} {sum(durations) / len(durations):>10.1f} "
+                f"{durations[len(durations) // 2]:>10.1f} {durations[-1]:>10.1f}"
+            )
+        if counters:
+            lines.append("")
+            lines.append(f"{'counter':<28} {'value':>10}")
+            for name in sorted(counters):
+                lines.append(f"{name:<28} {counters[name]:>10g}")
+        return "\n".join(lines)
+
+
+# Process-wide tracer shared by all agents; disabled until enabled by the CLI
+tracer = Tracer()
+
+
+def traced(name: str):
+    """
+    Decorator recording each call of a function as a span on the shared tracer
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
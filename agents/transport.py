@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agents.tracing import tracer
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# Responses worth retrying for an idempotent GET
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RequestCancelled(requests.RequestException):
+    """
+    The caller no longer needs this response (e.g. enough sources were collected)
+    """
+
+
+class DeadlineExceeded(requests.Timeout):
+    """
+    The request's overall time budget ran out across all attempts
+    """
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP date)
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Transport:
+    """
+    HTTP transport shared by search and scraping: pooled keep-alive
+    connections sized for concurrent fetches, retries of idempotent GETs
+    with jittered exponential backoff, and a deadline that bounds every
+    request (all attempts plus the body read) regardless of host speed.
+    """
+    def __init__(self, pool_connections: int = 32, pool_maxsize: int = 8, connect_timeout: float = 3.05,
+                 read_timeout: float = 10, deadline: float = 15, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 4.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        # pool_connections = hosts kept alive, pool_maxsize = connections per host;
+        # retries are handled here so they can respect the deadline
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def deadline_at(self) -> float:
+        """
+        Absolute monotonic deadline for a request starting now
+        """
+        return time.monotonic() + self.deadline
+
+    def get(self, url: str, headers: Optional[Dict] = None, stream: bool = False,
+            cancel: Optional[threading.Event] = None, deadline_at: Optional[float] = None) -> requests.Response:
+        """
+        GET with retries. Raises RequestCancelled once `cancel` is set and
+        DeadlineExceeded when `deadline_at` passes; the last retryable
+        response is returned as-is when no retry budget is left.
+        """
+        deadline_at = deadline_at or self.deadline_at()
+        attempt = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled(url)
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Deadline exceeded for {url}")
+            timeout = (min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+
+            try:
+                response = self.session.get(url, headers=headers, stream=stream, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline_at:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, parse_retry_after(response.headers.get('Retry-After')))
+                if time.monotonic() + delay >= deadline_at:
+                    return response
+                response.close()
+
+            attempt += 1
+            tracer.count('transport.retries')
+            if cancel is not None:
+                if cancel.wait(delay):
+                    raise RequestCancelled(url)
+            else:
+                time.sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Full-jitter exponential backoff, or the server's Retry-After if longer
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,124 @@
+"""
+Batch research mode: run many queries through one shared ResearchSystem.
+
+Usage:
+    python batch.py queries.jsonl [--concurrency 4] [--manifest batch_manifest.json]
+
+The input may be JSONL (one {"query": ..., "id": ...} object per line),
+CSV (a "query" column, optionally "id") or plain text (one query per line).
+All queries share the same LLM clients, HTTP session, caches and collector
+worker pool, so total fetch concurrency stays bounded by the collector.
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+from main import ResearchSystem
+from agents.report_generator import parse_formats
+
+
+def load_queries(path: str) -> List[Dict]:
+    """
+    Read queries from a JSONL, CSV or plain-text file
+    """
+    queries = []
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if extension == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('query', '').strip():
+                    queries.append({'id': row.get('id') or None, 'query': row['query'].strip()})
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if extension in ('.jsonl', '.json') or line.startswith('{'):
+                    item = json.loads(line)
+                    queries.append({'id': item.get('id'), 'query': item['query'].strip()})
+                else:
+                    queries.append({'id': None, 'query': line})
+    for index, item in enumerate(queries):
+        item['id'] = str(item['id']) if item['id'] is not None else str(index + 1)
+    return queries
+
+
+def run_one(system: ResearchSystem, item: Dict) -> Dict:
+    started = time.time()
+    result = {
+        'id': item['id'],
+        'query': item['query'],
+        'started_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+    }
+    try:
+        reports = system.research(item['query'])
+        result['status'] = 'ok' if reports else 'error'
+        result['report_path'] = next(iter(reports.values()), None)
+        result['reports'] = reports
+    except Exception as e:
+        print(f"Error researching '{item['query']}': {e}")
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['duration_s'] = round(time.time() - started, 3)
+    return result
+
+
+def run_batch(system: ResearchSystem, queries: List[Dict], concurrency: int = 4) -> List[Dict]:
+    """
+    Run queries with at most `concurrency` in progress at once, results in input order
+    """
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        return list(executor.map(lambda item: run_one(system, item), queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries_file", help="JSONL, CSV or text file of queries")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries researched at the same time")
+    parser.add_argument("--render-processes", type=int, default=0,
+                        help="worker processes for PDF rendering (0 = render in the calling thread)")
+    parser.add_argument("--format", type=parse_formats, default=["pdf"], metavar="FORMATS",
+                        help="comma-separated report formats: pdf, md, html, json, txt (default: pdf)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="research every query afresh instead of resuming unfinished runs from an earlier attempt")
+    parser.add_argument("--no-query-cache", action="store_true",
+                        help="research every query from scratch even if a similar one was answered recently")
+    parser.add_argument("--compress-sources", action="store_true",
+                        help="keep collected page text zlib-compressed in memory (less memory, slower prompt building)")
+    parser.add_argument("--manifest", default="batch_manifest.json", help="where to write the result manifest")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries_file)
+    print(f"Loaded {len(queries)} queries from {args.queries_file}")
+
+    started = time.time()
+    system = ResearchSystem(render_processes=args.render_processes, report_formats=args.format,
+                            resume=not args.no_resume, query_cache=not args.no_query_cache,
+                            collector_options={'compress_content': args.compress_sources})
+    results = run_batch(system, queries, args.concurrency)
+    system.report_generator.close()
+    elapsed = time.time() - started
+
+    manifest = {
+        'queries_file': args.queries_file,
+        'concurrency': args.concurrency,
+        'total': len(results),
+        'succeeded': sum(1 for r in results if r['status'] == 'ok'),
+        'failed': sum(1 for r in results if r['status'] != 'ok'),
+        'duration_s': round(elapsed, 3),
+        'results': results,
+    }
+    with open(args.manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Batch complete: {manifest['succeeded']}/{manifest['total']} succeeded in {elapsed:.1f}s")
+    print(f"Manifest saved to: {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
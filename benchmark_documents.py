@@ -0,0 +1,95 @@
+"""
+Benchmark the memory held by collected sources.
+
+Usage:
+    python benchmark_documents.py [--sources 5000] [--chars 1500] [--hosts 50]
+
+Builds the raw and cleaned source lists a collection run keeps (as
+DataCollector and ResearchSystem produce them) three ways: plain dicts,
+SourceDocument records and compressed SourceDocument records. Prints the
+memory each holds (tracemalloc) and the time to prepare prompt summaries
+from them, which is the main consumer of the content.
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict
+from agents.content_analyzer import ContentAnalyzer
+from agents.source_document import SourceDocument, clean_source
+
+WORDS = ("research reports measurable gains in cost reliability and adoption while open problems remain in "
+         "scale evaluation policy communities regions results independent reviews compare long term").split()
+
+
+def make_pages(sources: int, chars: int, hosts: int, seed: int = 7) -> str:
+    """
+    Scraped pages as JSON, so every measurement decodes its own fresh strings
+    """
+    rng = random.Random(seed)
+    pages = []
+    for i in range(sources):
+        text = []
+        while sum(len(word) + 1 for word in text) < chars:
+            text.append(rng.choice(WORDS))
+        pages.append({
+            'url': f"https://site{i % hosts}.example.com/articles/{i}",
+            'title': f"  Article {i}  about   {rng.choice(WORDS)} ",
+            'content': " ".join(text)[:chars],
+            'sub_query': f"sub-query {i % 5}",
+        })
+    return json.dumps(pages)
+
+
+def clean_dict(data: Dict) -> Dict:
+    # clean_source before SourceDocument
+    content = " ".join(data.get('content', '').split())
+    return dict(data, title=" ".join((data.get('title') or "No title").split()), content=content)
+
+
+def measure(label: str, pages_json: str, build: Callable[[Dict], object], clean: Callable) -> Dict:
+    gc.collect()
+    tracemalloc.start()
+    raw = [build(page) for page in json.loads(pages_json)]
+    cleaned = [clean(data) for data in raw]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    analyzer = ContentAnalyzer(llm_client=None)
+    started = time.perf_counter()
+    for index, data in enumerate(cleaned):
+        analyzer.summarize_source(index, data, 300)
+    summarize_ms = (time.perf_counter() - started) * 1000
+    count = len(raw)
+    del raw, cleaned
+    return {'label': label, 'bytes': held, 'per_source': held / count, 'summarize_ms': summarize_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=5000, help="collected sources")
+    parser.add_argument("--chars", type=int, default=1500, help="content characters per source (max_content_chars)")
+    parser.add_argument("--hosts", type=int, default=50, help="distinct hosts the sources come from")
+    args = parser.parse_args()
+
+    pages = make_pages(args.sources, args.chars, args.hosts)
+    results = [
+        measure("dict", pages, lambda page: page, clean_dict),
+        measure("SourceDocument", pages, SourceDocument.from_dict, clean_source),
+        measure("SourceDocument (compressed)", pages, lambda page: SourceDocument.from_dict(page, compress=True),
+                clean_source),
+    ]
+
+    baseline = results[0]['bytes']
+    print(f"{args.sources} sources of {args.chars} chars from {args.hosts} hosts (raw + cleaned lists)")
+    print(f"{'representation':<30}{'memory':>12}{'per source':>12}{'vs dict':>10}{'summaries':>12}")
+    for result in results:
+        print(f"{result['label']:<30}{result['bytes'] / 2 ** 20:>10.1f}MB{result['per_source']:>11.0f}B"
+              f"{result['bytes'] / baseline:>9.0%}{result['summarize_ms']:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
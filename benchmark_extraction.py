@@ -0,0 +1,77 @@
+"""
+Benchmark the HTML-to-text extraction backends used by DataCollector.
+
+Usage:
+    python benchmark_extraction.py [corpus_dir] [--max-chars 1500] [--repeat 5]
+
+corpus_dir should contain saved pages (*.html / *.htm). Without one, a
+synthetic corpus of small and large pages is generated in memory.
+"""
+
+import argparse
+import glob
+import os
+import time
+from agents.text_extractor import EXTRACTORS, get_extractor
+
+
+def load_corpus(corpus_dir):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "**", "*.htm*"), recursive=True)):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def synthetic_corpus():
+    script = "<script>var data = %s;</script>" % ("[" + ",".join(str(i) for i in range(5000)) + "]")
+    style = "<style>" + ".c{color:red}" * 2000 + "</style>"
+    paragraph = "<p>Artificial intelligence is changing how clinicians diagnose disease &amp; plan care.</p>\n"
+    nav = "<nav><ul>" + "<li><a href='/x'>Link</a></li>" * 200 + "</ul></nav>"
+    pages = []
+    for name, paragraphs in (("small", 30), ("medium", 500), ("large", 10000)):
+        html = f"<html><head><title>{name}</title>{style}{script}</head><body>{nav}{paragraph * paragraphs}{script}</body></html>"
+        pages.append((f"{name}.html", html))
+    return pages
+
+
+def time_backend(name, html, max_chars, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = get_extractor(name, max_chars).extract(html)
+        best = min(best, time.perf_counter() - start)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", nargs="?", help="directory of saved HTML pages")
+    parser.add_argument("--max-chars", type=int, default=1500, help="clean text to keep per page (0 = all)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per page; the best time is reported")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus_dir) if args.corpus_dir else synthetic_corpus()
+    if not pages:
+        print(f"No HTML pages found in {args.corpus_dir}")
+        return
+    max_chars = args.max_chars or None
+    backends = list(EXTRACTORS)
+
+    print(f"{'page':<30} {'KB':>8} " + " ".join(f"{name + ' ms':>14}" for name in backends) + f" {'speedup':>9}")
+    totals = {name: 0.0 for name in backends}
+    for page_name, html in pages:
+        timings = {}
+        for name in backends:
+            timings[name], _ = time_backend(name, html, max_chars, args.repeat)
+            totals[name] += timings[name]
+        speedup = timings["soup"] / timings["streaming"] if timings["streaming"] else float("inf")
+        print(f"{page_name[:30]:<30} {len(html) / 1024:>8.1f} "
+              + " ".join(f"{timings[name] * 1000:>14.2f}" for name in backends) + f" {speedup:>8.1f}x")
+
+    print(f"{'TOTAL':<30} {'':>8} " + " ".join(f"{totals[name] * 1000:>14.2f}" for name in backends)
+          + f" {totals['soup'] / totals['streaming']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
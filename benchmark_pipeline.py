@@ -0,0 +1,322 @@
+"""
+Benchmark the full research pipeline offline.
+
+Usage:
+    python benchmark_pipeline.py [--queries 8] [--concurrency 4] [--pages saved_pages_dir]
+                                 [--page-latency 0.05] [--llm-latency 0.2] [--output benchmark_results.json]
+                                 [--compare previous_results.json]
+
+ResearchSystem runs against a local fixture HTTP server that answers
+search requests with Google-style result pages and serves either recorded
+pages (*.html in --pages) or generated ones, with configurable latency.
+LLM calls go to StubBackend with configurable latency, so no network
+access or API key is needed and runs are repeatable.
+
+Reported: per-stage latency percentiles from the tracer spans, end-to-end
+latency per query, throughput under concurrent queries, peak memory
+(tracemalloc and max RSS) and bytes transferred. Results are written as
+JSON; --compare prints the change against an earlier results file.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, quote, quote_plus, unquote, urlparse
+from benchmark_extraction import load_corpus
+from main import ResearchSystem
+from agents.llm_client import LLMClient, StubBackend
+from agents.report_generator import parse_formats
+from agents.search import GoogleSearchProvider
+from agents.tracing import tracer
+
+TOPICS = ["solar storage", "urban farming", "quantum sensors", "ocean plastics", "gene therapy",
+          "battery recycling", "wildfire detection", "remote education", "coral restoration", "fusion materials"]
+
+BOILERPLATE = ("<nav><ul>" + "<li><a href='/'>Home</a></li><li><a href='/about'>About</a></li>" * 20 + "</ul></nav>"
+               "<div class='cookie'>We use cookies to improve your experience. Accept all cookies.</div>")
+
+
+class FixtureServer:
+    """
+    Threaded local HTTP server standing in for the search engine and the web.
+    Latency per page is deterministic (derived from the URL) so runs compare.
+    """
+    def __init__(self, pages: Optional[List] = None, page_latency: float = 0.05, results_per_search: int = 10):
+        self.pages = pages or []
+        self.page_latency = page_latency
+        self.results_per_search = results_per_search
+        self.bytes_sent = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == "/search":
+                    body = fixture.search_page(parse_qs(parsed.query))
+                else:
+                    body = fixture.page(unquote(parsed.path))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with fixture._lock:
+                    fixture.requests += 1
+                    fixture.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="fixture-server", daemon=True).start()
+
+    def search_page(self, params: Dict) -> bytes:
+        query = params.get("q", [""])[0]
+        count = min(int(params.get("num", [self.results_per_search])[0]), self.results_per_search)
+        links = "".join(
+            f'<div><a href="/url?q={quote_plus(f"{self.base_url}/page/{quote(query)}/{i}")}&amp;sa=U">'
+            f'{query} result {i}</a></div>'
+            for i in range(count)
+        )
+        return f"<html><body>{links}</body></html>".encode("utf-8")
+
+    def page(self, path: str) -> bytes:
+        seed = zlib.crc32(path.encode("utf-8"))
+        # Up to 2x the mean latency, so hedged fetches have stragglers to skip
+        time.sleep(self.page_latency * 2 * (seed % 1000) / 1000)
+        if self.pages:
+            return self.pages[seed % len(self.pages)][1].encode("utf-8")
+        topic = path.split("/")[2] if path.count("/") >= 3 else "research"
+        rng = random.Random(seed)
+        sentences = [
+            f"Recent work on {topic} reports measurable gains in cost, reliability and adoption.",
+            f"Researchers studying {topic} highlight open problems in scale and long-term evaluation.",
+            f"Policy makers weigh the benefits and the challenges of {topic} for local communities.",
+            "Independent reviews compare results across regions and years.",
+        ]
+        paragraphs = "".join(f"<p>{' '.join(rng.choice(sentences) for _ in range(6))}</p>" for _ in range(12))
+        html = f"<html><head><title>{topic.title()}</title></head><body>{BOILERPLATE}{paragraphs}{BOILERPLATE}</body></html>"
+        return html.encode("utf-8")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentiles(values: Sequence[float]) -> Dict:
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered), 2),
+        'p50_ms': round(pick(50), 2),
+        'p90_ms': round(pick(90), 2),
+        'p99_ms': round(pick(99), 2),
+        'max_ms': round(ordered[-1], 2),
+    }
+
+
+def git_version() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def max_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_benchmark(args) -> Dict:
+    pages = load_corpus(args.pages) if args.pages else None
+    fixture = FixtureServer(pages, page_latency=args.page_latency)
+    queries = [f"{TOPICS[i % len(TOPICS)]} {i // len(TOPICS) + 1}" for i in range(args.queries)]
+    stub = StubBackend(latency=args.llm_latency, seconds_per_token=args.llm_seconds_per_token)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        system = ResearchSystem(
+            search_backend="web", render_processes=args.render_processes, report_formats=args.format,
+            artifact_dir=f"{workdir}/runs", resume=False, query_cache=False,
+            cache_dir=f"{workdir}/cache", output_dir=f"{workdir}/reports",
+            llm_client=LLMClient(backend=stub, requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9),
+            collector_options={'per_host_delay': 0, 'max_workers': args.max_workers,
+                               # Every fixture page is on one host
+                               'max_per_host': args.max_workers},
+        )
+        collector = system.data_collector
+        collector.search_provider = GoogleSearchProvider(collector.transport, collector.scheduler,
+                                                         cache=collector.cache, base_url=f"{fixture.base_url}/search")
+
+        tracer.reset()
+        tracer.enabled = True
+        if args.tracemalloc:
+            tracemalloc.start()
+        latencies = []
+        failures = 0
+
+        def research(query: str):
+            started = time.perf_counter()
+            reports = system.research(query)
+            return time.perf_counter() - started, reports
+
+        output = io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+            with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="benchmark") as executor:
+                for future in [executor.submit(research, query) for query in queries]:
+                    try:
+                        elapsed, reports = future.result()
+                        latencies.append(elapsed * 1000)
+                        failures += 0 if reports else 1
+                    except Exception as e:
+                        print(f"Benchmark query failed: {e}", file=sys.stderr)
+                        failures += 1
+        wall = time.perf_counter() - started
+        peak_traced = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+        if args.tracemalloc:
+            tracemalloc.stop()
+        tracer.enabled = False
+        system.report_generator.close()
+        collector.close()
+        fixture.close()
+
+    by_stage: Dict[str, List[float]] = {}
+    for span in tracer.spans:
+        by_stage.setdefault(span['name'], []).append(span['duration_us'] / 1000)
+
+    return {
+        'benchmark': 'pipeline',
+        'version': git_version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {
+            'queries': args.queries,
+            'concurrency': args.concurrency,
+            'max_workers': args.max_workers,
+            'page_latency_s': args.page_latency,
+            'llm_latency_s': args.llm_latency,
+            'llm_seconds_per_token': args.llm_seconds_per_token,
+            'formats': args.format,
+            'render_processes': args.render_processes,
+            'recorded_pages': len(pages) if pages else 0,
+            'tracemalloc': args.tracemalloc,
+        },
+        'wall_s': round(wall, 3),
+        'throughput_qps': round(len(latencies) / wall, 3) if wall else None,
+        'failures': failures,
+        'end_to_end': percentiles(latencies),
+        'stages': {name: percentiles(values) for name, values in sorted(by_stage.items())},
+        'memory': {'tracemalloc_peak_bytes': peak_traced, 'max_rss_bytes': max_rss_bytes()},
+        'bytes': {
+            'server_sent': fixture.bytes_sent,
+            'server_requests': fixture.requests,
+            'collector_fetched': int(tracer.counters.get('collector.bytes_fetched', 0)),
+        },
+        'llm': {'calls': stub.calls, 'max_in_flight': stub.max_in_flight},
+        'counters': dict(sorted(tracer.counters.items())),
+    }
+
+
+def print_summary(results: Dict):
+    print(f"{results['config']['queries']} queries, concurrency {results['config']['concurrency']}: "
+          f"{results['wall_s']} s wall, {results['throughput_qps']} queries/s, {results['failures']} failed")
+    print(f"{'stage':<28} {'count':>6} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, stats in [('end_to_end', results['end_to_end'])] + list(results['stages'].items()):
+        if stats['count']:
+            print(f"{name:<28} {stats['count']:>6} {stats['p50_ms']:>10.1f} {stats['p90_ms']:>10.1f} "
+                  f"{stats['p99_ms']:>10.1f} {stats['max_ms']:>10.1f}")
+    memory, transferred = results['memory'], results['bytes']
+    if memory['tracemalloc_peak_bytes'] is not None:
+        print(f"peak traced memory: {memory['tracemalloc_peak_bytes'] / 1e6:.1f} MB")
+    if memory['max_rss_bytes'] is not None:
+        print(f"max RSS: {memory['max_rss_bytes'] / 1e6:.1f} MB")
+    print(f"bytes served: {transferred['server_sent']} in {transferred['server_requests']} requests, "
+          f"bytes read by collector: {transferred['collector_fetched']}")
+
+
+def compare(results: Dict, previous: Dict):
+    """
+    Print the relative change of the headline metrics against an earlier run
+    """
+    metrics = [('throughput_qps', ('throughput_qps',)), ('end_to_end p50', ('end_to_end', 'p50_ms')),
+               ('end_to_end p90', ('end_to_end', 'p90_ms')), ('tracemalloc peak', ('memory', 'tracemalloc_peak_bytes')),
+               ('bytes served', ('bytes', 'server_sent'))]
+    for stage in results['stages']:
+        metrics.append((f"{stage} p50", ('stages', stage, 'p50_ms')))
+
+    def lookup(data, path):
+        for key in path:
+            if not isinstance(data, dict) or key not in data:
+                return None
+            data = data[key]
+        return data
+
+    print(f"\ncompared with {previous.get('version')} ({previous.get('timestamp')}):")
+    for label, path in metrics:
+        old, new = lookup(previous, path), lookup(results, path)
+        if old and new is not None:
+            print(f"  {label:<32} {old:>12g} -> {new:<12g} {100 * (new - old) / old:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=8, help="research queries to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries in progress at once")
+    parser.add_argument("--max-workers", type=int, default=8, help="collector fetch workers")
+    parser.add_argument("--pages", metavar="DIR", help="recorded pages (*.html) to serve instead of generated ones")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="mean seconds before a page is served")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per stub LLM call")
+    parser.add_argument("--llm-seconds-per-token", type=float, default=0.0, help="extra stub seconds per completion token")
+    parser.add_argument("--format", type=parse_formats, default=["pdf"], metavar="FORMATS", help="report formats to render")
+    parser.add_argument("--render-processes", type=int, default=0, help="worker processes for PDF rendering")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false",
+                        help="skip tracemalloc (faster; peak memory is then only max RSS)")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", metavar="PATH", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
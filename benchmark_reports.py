@@ -0,0 +1,75 @@
+"""
+Benchmark PDF report rendering throughput.
+
+Usage:
+    python benchmark_reports.py [--reports 8] [--processes 4]
+
+Renders small and very large synthesized payloads serially and through
+ReportGenerator's process pool, and prints reports per second for each.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from agents.report_generator import ReportGenerator
+
+PARAGRAPH = ("Artificial intelligence is changing how clinicians diagnose disease, plan treatment and "
+             "monitor patients. Studies report gains in accuracy and speed, alongside open questions "
+             "about bias, privacy and accountability. ") * 3
+
+
+def make_payload(sections: int, paragraphs: int, sources: int) -> dict:
+    return {
+        "title": f"Benchmark Report ({sections} sections)",
+        "sections": [
+            {
+                "heading": f"Section {i + 1}",
+                "content": "\n\n".join(PARAGRAPH for _ in range(paragraphs)),
+                "sources": [f"https://example.com/source/{i}/{j}" for j in range(sources)],
+            }
+            for i in range(sections)
+        ],
+        "conclusion": PARAGRAPH,
+    }
+
+
+PAYLOADS = {
+    "small": make_payload(sections=3, paragraphs=3, sources=2),
+    "large": make_payload(sections=60, paragraphs=12, sources=8),
+}
+
+
+def run(generator: ReportGenerator, payload: dict, reports: int) -> float:
+    jobs = [(f"benchmark {i}", payload) for i in range(reports)]
+    start = time.perf_counter()
+    paths = generator.generate_many(jobs)
+    elapsed = time.perf_counter() - start
+    assert all(path and path.endswith(".pdf") for path in paths), paths
+    return reports / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=8, help="reports rendered per measurement")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2, help="worker processes for the pool run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        serial = ReportGenerator(output_dir=output_dir)
+        pooled = ReportGenerator(output_dir=output_dir, processes=args.processes)
+        # Warm both generators the same way, so neither the ReportLab import
+        # and style setup nor process start-up is measured
+        serial.generate_many([(f"warmup {i}", PAYLOADS["small"]) for i in range(args.processes)])
+        pooled.generate_many([(f"warmup {i}", PAYLOADS["small"]) for i in range(args.processes)])
+
+        print(f"{'payload':<10} {'serial rep/s':>14} {f'pool x{args.processes} rep/s':>16} {'speedup':>9}")
+        for name, payload in PAYLOADS.items():
+            serial_rate = run(serial, payload, args.reports)
+            pooled_rate = run(pooled, payload, args.reports)
+            print(f"{name:<10} {serial_rate:>14.2f} {pooled_rate:>16.2f} {pooled_rate / serial_rate:>8.1f}x")
+        pooled.close()
+
+
+if __name__ == "__main__":
+    main()
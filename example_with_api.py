@@ -38,11 +38,9 @@ def run_research_with_api(original_query: str):
     
     # Step 2: Collect data
     print("Step 2: Collecting data...")
-    all_data = []
     for sub_query in sub_queries:
         print(f"Researching: {sub_query}")
-        data = data_collector.search_and_scrape(sub_query)
-        all_data.extend(data)
+    all_data = data_collector.collect_all(sub_queries)
     
     print(f"Collected {len(all_data)} sources")
     
@@ -1,68 +1,420 @@
 import os
-import sys
-import json
+import argparse
+import itertools
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 from agents.query_processor import QueryProcessor
-from agents.data_collector import DataCollector
-from agents.content_analyzer import ContentAnalyzer
-from agents.report_generator import ReportGenerator
+from agents.content_analyzer import ContentAnalyzer, is_fallback_synthesis
+from agents.report_generator import ReportGenerator, get_report_styles, parse_formats
+from agents.llm_cache import CompletionCache
+from agents.llm_client import LLMClient
+from agents.dedup import SourceDeduplicator
+from agents.tracing import tracer, traced
+from agents.search import SEARCH_BACKENDS
+from agents.artifacts import ArtifactStore, Run, REPLAYABLE_STAGES
+from agents.source_document import clean_source
+from agents.startup import profile_startup
+from agents.text_extractor import DEFAULT_EXTRACTOR, DEFAULT_MAX_CONTENT_CHARS
 
 # Load environment variables
 load_dotenv()
 
 class ResearchSystem:
-    def __init__(self):
-        self.query_processor = QueryProcessor()
-        self.data_collector = DataCollector()
-        self.content_analyzer = ContentAnalyzer()
-        self.report_generator = ReportGenerator()
+    def __init__(self, search_backend: str = "local+web", max_total_sources: int = None, render_processes: int = 0,
+                 report_formats: Sequence[str] = ("pdf",), artifact_dir: str = "runs", resume: bool = True,
+                 cache_dir: str = ".research_cache", output_dir: str = "reports",
+                 llm_client: Optional[LLMClient] = None, collector_options: Optional[Dict] = None,
+                 query_cache: bool = True):
+        """
+        `llm_client` replaces the Groq-backed client (e.g. LLMClient(backend=StubBackend())),
+        and `collector_options` are extra DataCollector arguments such as per_host_delay.
+        
+        Construction is cheap: the data collector (HTTP stack) and the query
+        cache are built on first use, numpy is loaded with the first cache
+        lookup or passage ranking, the Groq client on the first LLM request
+        and PDF styles with the first PDF, so cached, replayed and fallback
+        runs never load what they do not use.
+        """
+        self.search_backend = search_backend
+        self.cache_dir = cache_dir
+        self.collector_options = dict(collector_options or {})
+        self.use_query_cache = query_cache
+        # Continue unfinished runs of the same query and configuration
+        self.resume = resume
+        # Stop collecting (and cancel in-flight fetches) after this many sources
+        self.max_total_sources = max_total_sources
+        # One completion cache and one rate-limited LLM client shared by both LLM-backed agents
+        self.llm_cache = CompletionCache(cache_dir)
+        self.llm_client = llm_client if llm_client is not None else LLMClient()
+        self.query_processor = QueryProcessor(llm_cache=self.llm_cache, llm_client=self.llm_client)
+        self.content_analyzer = ContentAnalyzer(llm_cache=self.llm_cache, llm_client=self.llm_client)
+        self.report_generator = ReportGenerator(output_dir=output_dir, processes=render_processes, formats=report_formats)
+        # Every run keeps its sub-queries, documents, synthesis and report paths here
+        self.artifacts = ArtifactStore(artifact_dir)
+        # Built on first use (see data_collector and query_cache)
+        self._data_collector = None
+        self._query_cache = None
+        self._init_lock = threading.Lock()
     
-    def run_research(self, original_query: str):
+    @property
+    def data_collector(self):
+        # Locked so concurrent first runs (batch mode, the service) share one collector and worker pool
+        if self._data_collector is None:
+            with self._init_lock:
+                if self._data_collector is None:
+                    from agents.data_collector import DataCollector
+                    self._data_collector = DataCollector(search_backend=self.search_backend, cache_dir=self.cache_dir,
+                                                         **self.collector_options)
+        return self._data_collector
+    
+    @property
+    def query_cache(self):
+        """
+        Finished results, matched to new queries by subject and similarity (None when disabled)
         """
-        Run the complete research pipeline
+        if not self.use_query_cache:
+            return None
+        if self._query_cache is None:
+            with self._init_lock:
+                if self._query_cache is None:
+                    from agents.query_cache import QueryCache
+                    self._query_cache = QueryCache(self.cache_dir)
+        return self._query_cache
+    
+    def run_research(self, original_query: str, formats: Optional[Sequence[str]] = None):
+        """
+        Run the complete research pipeline and return the path of the first
+        report written (see `research` for every output)
+        """
+        reports = self.research(original_query, formats)
+        return next(iter(reports.values()), None)
+    
+    @traced("pipeline.run")
+    def research(self, original_query: str, formats: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """
+        Run the complete research pipeline, returning {format: report path}.
+        Steps 1 and 2 are streamed: each sub-query is searched as soon as the
+        decomposition emits it, and every scraped source is cleaned,
+        de-duplicated and summarized while other fetches are still running.
+        
+        Every stage is checkpointed in the artifact store under a key derived
+        from the query and configuration. With `resume`, an unfinished run
+        with the same key continues after its last completed stage, and
+        sub-queries whose collection already finished are not fetched again.
+        
+        An earlier query with the same terms and configuration is answered
+        from the query cache; one on the same subject that differs only in
+        generic framing words supplies a warm start (its sources are
+        synthesized again for this query).
         """
         print(f"Starting research on: {original_query}")
+        config = self._run_config()
+        cached = self.query_cache.lookup(original_query, config) if self.query_cache is not None else None
+        if cached is not None and cached['reuse']:
+            return self._reuse_cached(original_query, config, cached, formats)
+        if self.resume:
+            run = self.artifacts.resume_or_create_run(original_query, config)
+        else:
+            run = self.artifacts.create_run(original_query, config)
+        resumed = bool(run.manifest['artifacts'])
+        print(f"Run ID: {run.run_id}" + (" (resuming)" if resumed else ""))
         
-        # Step 1: Decompose query
+        try:
+            if run.has("synthesis"):
+                print("Steps 1-3 already completed, reusing the stored synthesis")
+                return self._render(run, run.get_json("synthesis"), formats)
+            if run.has("sources"):
+                print("Steps 1-2 already completed, reusing the stored sources")
+                return self._synthesize_and_render(run, run.get_json("sub_queries", []),
+                                                   run.get_documents("sources"), None, formats)
+            if cached is not None and not resumed:
+                warm = self._warm_start(run, cached)
+                if warm is not None:
+                    return self._synthesize_and_render(run, *warm, None, formats)
+            sub_queries, cleaned = self._collect(run)
+            return self._synthesize_and_render(run, sub_queries, cleaned.sources, cleaned.summaries, formats)
+        except BaseException:
+            run.set_status("failed")
+            raise
+        finally:
+            self.artifacts.release(run)
+    
+    def _reuse_cached(self, original_query: str, config: Dict, cached: Dict,
+                      formats: Optional[Sequence[str]]) -> Dict[str, str]:
+        """
+        Answer from a query cache hit: the earlier reports when they cover
+        the requested formats and still exist, otherwise a fresh rendering
+        of the cached synthesized content
+        """
+        run = self.artifacts.create_run(original_query, config)
+        print(f"Run ID: {run.run_id}")
+        print(f"Reusing research for '{cached['query']}' (similarity {cached['similarity']}, "
+              f"{cached['age_s']:.0f}s old)")
+        try:
+            run.put_json("query_cache_hit", {key: cached[key] for key in ('query', 'run_id', 'similarity', 'age_s')},
+                         stage="decompose")
+            run.put_json("synthesis", cached['synthesis'], stage="synthesize")
+            requested = list(formats or self.report_generator.formats)
+            stored = cached['reports']
+            if not all(stored.get(name) and os.path.exists(stored[name]) for name in requested):
+                return self._render(run, cached['synthesis'], formats)
+            reports = {name: stored[name] for name in requested}
+            run.put_json("reports", reports, stage="render")
+            run.set_status("complete")
+            for report_format, report_path in reports.items():
+                print(f"Research complete! {report_format.upper()} report (cached) at: {report_path}")
+            return reports
+        except BaseException:
+            run.set_status("failed")
+            raise
+        finally:
+            self.artifacts.release(run)
+    
+    def _warm_start(self, run: Run, cached: Dict) -> Optional[Tuple[List[str], List[Dict]]]:
+        """
+        Sub-queries and sources of the cached run, copied into `run`, or
+        None if that run's artifacts are gone
+        """
+        try:
+            previous = self.artifacts.open_run(cached['run_id'])
+        except (OSError, TypeError, ValueError):
+            return None
+        sources = previous.get_documents("sources")
+        if not sources:
+            return None
+        sub_queries = previous.get_json("sub_queries", [])
+        print(f"Warm start from '{cached['query']}' (similarity {cached['similarity']}): "
+              f"reusing {len(sources)} sources")
+        run.put_json("warm_start", {key: cached[key] for key in ('query', 'run_id', 'similarity', 'age_s')},
+                     stage="decompose")
+        run.put_json("sub_queries", sub_queries, stage="decompose")
+        run.put_documents("sources", sources, stage="clean")
+        return sub_queries, sources
+    
+    def _run_config(self) -> Dict:
+        """
+        Settings that change a run's results, part of its checkpoint key
+        """
+        return {
+            'search_backend': self.search_backend,
+            'max_total_sources': self.max_total_sources,
+            'extractor': self.collector_options.get('extractor', DEFAULT_EXTRACTOR),
+            'max_content_chars': self.collector_options.get('max_content_chars', DEFAULT_MAX_CONTENT_CHARS),
+            'synthesis_mode': self.content_analyzer.synthesis_mode,
+        }
+    
+    def _collect(self, run: Run) -> Tuple[List[str], "_CleanedSources"]:
+        """
+        Steps 1 and 2, checkpointing the sub-queries once decomposition
+        finishes and each sub-query's sources once its collection finishes
+        """
+        # Step 1: Decompose query (consumed lazily by the collector)
         print("Step 1: Processing query...")
-        sub_queries = self.query_processor.decompose_query(original_query)
-        print(f"Generated sub-queries: {sub_queries}")
+        stored_sub_queries = run.get_json("sub_queries")
+        checkpoints = run.get_json("collected", {})
+        sub_queries = []
+        
+        def sub_query_stream():
+            if stored_sub_queries is not None:
+                decomposed = stored_sub_queries
+            else:
+                decomposed = self.query_processor.iter_sub_queries(run.query)
+            for sub_query in decomposed:
+                sub_queries.append(sub_query)
+                if sub_query in checkpoints:
+                    print(f"Already collected: {sub_query}")
+                    continue
+                print(f"Researching: {sub_query}")
+                yield sub_query
+            if stored_sub_queries is None:
+                run.put_json("sub_queries", sub_queries, stage="decompose")
         
         # Step 2: Collect data
         print("Step 2: Collecting data...")
-        all_data = []
-        for sub_query in sub_queries:
-            print(f"Researching: {sub_query}")
-            data = self.data_collector.search_and_scrape(sub_query)
-            all_data.extend(data)
+        raw_data = []
+        raw_by_query = {}
+        cleaned = _CleanedSources(self)
+        for name in checkpoints.values():
+            for data in run.get_documents(name):
+                raw_data.append(data)
+                cleaned.add(data)
+        
+        # Numbered past every stored checkpoint, so a repeated sub-query never reuses a name
+        numbers = itertools.count(max((int(name.rsplit("_", 1)[1]) for name in checkpoints.values()), default=-1) + 1)
+        
+        def on_sub_query_done(sub_query):
+            # Only sub-queries whose search succeeded and found sources get here
+            name = f"collected_{next(numbers):02d}"
+            run.put_documents(name, raw_by_query.get(sub_query, []), stage="collect")
+            checkpoints[sub_query] = name
+            run.put_json("collected", checkpoints, stage="collect")
+        
+        with tracer.span("pipeline.collect") as span:
+            for data in self.data_collector.iter_collect(sub_query_stream(), max_total_sources=self.max_total_sources,
+                                                         on_sub_query_done=on_sub_query_done):
+                raw_data.append(data)
+                raw_by_query.setdefault(data.get('sub_query'), []).append(data)
+                cleaned.add(data)
+            span.set('sources', len(cleaned.sources))
+            span.set('duplicates', len(cleaned.deduplicator.collapsed))
+        
+        if not run.has("sub_queries"):
+            # Collection stopped before the decomposition was used up
+            run.put_json("sub_queries", sub_queries, stage="decompose")
+        run.put_documents("raw_documents", raw_data, stage="collect")
+        self._store_cleaned(run, cleaned)
+        
+        print(f"Generated sub-queries: {sub_queries}")
+        print(f"Collected {len(cleaned.sources)} sources")
+        if self.data_collector.cache:
+            print(f"HTTP cache: {self.data_collector.cache.stats()}")
+        if self.data_collector.health is not None:
+            print(f"Host health: {self.data_collector.health.stats()}")
+        return sub_queries, cleaned
+    
+    @traced("pipeline.replay")
+    def replay(self, run_id: str, from_stage: str = "synthesize", formats: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """
+        Re-run a stored run from `from_stage` ("clean", "synthesize" or
+        "render") using the artifacts of the earlier stages, without
+        decomposing the query or fetching anything again. Raises ValueError
+        if the run never stored that stage's input (e.g. a query cache hit
+        has no sources to synthesize from).
+        """
+        if from_stage not in REPLAYABLE_STAGES:
+            raise ValueError(f"cannot replay from stage '{from_stage}'")
+        run = self.artifacts.open_run(run_id)
+        if from_stage == "clean":
+            required = "raw_documents"
+        elif from_stage == "render" and run.has("synthesis"):
+            required = "synthesis"
+        else:
+            # Rendering without a stored synthesis synthesizes it first
+            required = "sources"
+        if not run.has(required):
+            raise ValueError(f"run {run.run_id} has no '{required}' artifact to replay from stage '{from_stage}'")
+        print(f"Replaying run {run.run_id} from stage '{from_stage}': {run.query}")
+        sub_queries = run.get_json("sub_queries", [])
         
-        print(f"Collected {len(all_data)} sources")
+        if required == "synthesis":
+            return self._render(run, run.get_json("synthesis"), formats)
         
+        if from_stage == "clean":
+            cleaned = _CleanedSources(self)
+            for data in run.get_documents("raw_documents"):
+                cleaned.add(data)
+            self._store_cleaned(run, cleaned)
+            sources = cleaned.sources
+        else:
+            sources = run.get_documents("sources")
+        return self._synthesize_and_render(run, sub_queries, sources, None, formats)
+    
+    def _store_cleaned(self, run: Run, cleaned: "_CleanedSources"):
+        for duplicate in cleaned.deduplicator.collapsed:
+            print(f"Dropped {duplicate['url']}: {duplicate['reason']} of {duplicate['duplicate_of']} "
+                  f"(similarity {duplicate['similarity']})")
+        run.put_documents("sources", cleaned.sources, stage="clean")
+        run.put_json("duplicates", cleaned.deduplicator.collapsed, stage="clean")
+    
+    def _synthesize_and_render(self, run: Run, sub_queries: List[str], sources: List[Dict],
+                               source_summaries: Optional[List[str]], formats: Optional[Sequence[str]]) -> Dict[str, str]:
         # Step 3: Analyze content
         print("Step 3: Analyzing content...")
         synthesized_content = self.content_analyzer.synthesize_content(
-            original_query, sub_queries, all_data
+            run.query, sub_queries, sources, source_summaries=source_summaries
         )
-        
-        # Save synthesized content for debugging
-        with open("synthesized_content.json", "w") as f:
-            json.dump(synthesized_content, f, indent=2)
-        
-        # Step 4: Generate report
+        if is_fallback_synthesis(synthesized_content):
+            # The LLM failed (timeout, error, no key): the fallback report is
+            # written, but the run stays unfinished so the next attempt
+            # resumes from the stored sources and synthesizes again
+            print("Synthesis fell back to the basic report; the run can be resumed from its sources")
+            return self._render(run, synthesized_content, formats, complete=False)
+        run.put_json("synthesis", synthesized_content, stage="synthesize")
+        reports = self._render(run, synthesized_content, formats)
+        if self.query_cache is not None and reports:
+            self.query_cache.put(run.query, synthesized_content, reports, run.run_id,
+                                 run.manifest.get('config'))
+        return reports
+    
+    def _render(self, run: Run, synthesized_content: Dict, formats: Optional[Sequence[str]],
+                complete: bool = True) -> Dict[str, str]:
+        # Step 4: Generate reports
         print("Step 4: Generating report...")
-        report_path = self.report_generator.generate_pdf_report(
-            original_query, synthesized_content
+        reports = self.report_generator.generate_reports(
+            run.query, synthesized_content, formats, run_id=run.run_id
         )
+        run.put_json("reports", reports, stage="render")
+        if not reports:
+            run.set_status("failed")
+        else:
+            run.set_status("complete" if complete else "fallback")
         
-        print(f"Research complete! Report saved to: {report_path}")
-        return report_path
+        print(f"LLM cache: {self.llm_cache.stats()}")
+        if self.query_cache is not None:
+            print(f"Query cache: {self.query_cache.stats()}")
+        for report_format, report_path in reports.items():
+            print(f"Research complete! {report_format.upper()} report saved to: {report_path}")
+        print(f"Artifacts saved to: {run.path}")
+        return reports
+
+
+class _CleanedSources:
+    """
+    Cleaned, de-duplicated sources (and their prompt summaries), built one source at a time
+    """
+    def __init__(self, system: ResearchSystem):
+        self.system = system
+        self.deduplicator = SourceDeduplicator()
+        self.sources = []
+        self.summaries = []
+    
+    def add(self, data: dict):
+        data = clean_source(data)
+        if not data or self.deduplicator.check(data):
+            return
+        if self.system.content_analyzer.ranker is None:
+            # Without passage ranking, prompt parts can be prepared while collection runs
+            self.summaries.append(self.system.content_analyzer.summarize_source(len(self.sources), data))
+        self.sources.append(data)
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py \"Your research query here\"")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Multi-Agent Research System")
+    parser.add_argument("query", nargs="*", help="Your research query")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="record per-stage timings, write them as a Chrome trace to PATH and print a summary")
+    parser.add_argument("--search-backend", choices=SEARCH_BACKENDS, default="local+web",
+                        help="where sources come from: the web, the local index of past runs, or both (default)")
+    parser.add_argument("--format", type=parse_formats, default=["pdf"], metavar="FORMATS",
+                        help="comma-separated report formats: pdf, md, html, json, txt (default: pdf)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="start a new run even if an unfinished run of the same query can be resumed")
+    parser.add_argument("--no-query-cache", action="store_true",
+                        help="research from scratch even if a similar query was answered recently")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report import and initialization cost, then exit")
+    parser.add_argument("--replay", metavar="RUN_ID",
+                        help="re-run a stored run (or 'latest') from --from-stage without fetching anything")
+    parser.add_argument("--from-stage", choices=REPLAYABLE_STAGES, default="synthesize",
+                        help="first stage to re-run with --replay (default: synthesize)")
+    args = parser.parse_args()
+    if args.profile_startup:
+        systems = []
+        print(profile_startup([
+            ("ResearchSystem()", lambda: systems.append(
+                ResearchSystem(search_backend=args.search_backend, report_formats=args.format,
+                               resume=not args.no_resume, query_cache=not args.no_query_cache))),
+            ("query cache", lambda: systems[0].query_cache),
+            ("data collector", lambda: systems[0].data_collector),
+            ("LLM backend", lambda: systems[0].llm_client.backend),
+            ("PDF styles", get_report_styles),
+        ]))
+        return
+    if not args.query and not args.replay:
+        parser.error("a research query or --replay RUN_ID is required")
     
-    query = " ".join(sys.argv[1:])
+    query = " ".join(args.query)
+    tracer.enabled = bool(args.trace)
     
     # Check for API key
     api_key = os.getenv("GROQ_API_KEY")
@@ -72,8 +424,23 @@ def main():
         print("For full functionality, please set your Groq API key in a .env file.")
     
     # Run the research system
-    system = ResearchSystem()
-    system.run_research(query)
+    system = ResearchSystem(search_backend=args.search_backend, report_formats=args.format,
+                            resume=not args.no_resume, query_cache=not args.no_query_cache)
+    if args.replay:
+        run_id = system.artifacts.latest_run_id() if args.replay == "latest" else args.replay
+        if run_id is None:
+            parser.error("no stored runs to replay")
+        try:
+            system.replay(run_id, args.from_stage)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        system.run_research(query)
+    
+    if args.trace:
+        tracer.export_chrome_trace(args.trace)
+        print(tracer.summary())
+        print(f"Trace saved to: {args.trace}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
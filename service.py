@@ -0,0 +1,373 @@
+"""
+Research service: a long-running process that keeps one warm ResearchSystem
+behind a small local HTTP API, so callers no longer pay interpreter
+startup, connection setup and style-sheet construction per query.
+
+Usage:
+    python service.py [--port 8765 | --unix-socket /tmp/research.sock] [--workers 4] [--max-queue 32]
+
+Endpoints (JSON unless noted):
+    POST /jobs                      {"query": "...", "formats": "md,html"}  -> 202 job
+                                    503 with Retry-After when the queue is full
+    GET  /jobs                      recent jobs, newest first
+    GET  /jobs/<id>                 job status, timings and report formats
+    GET  /jobs/<id>/report?format=  the report file itself (first format by default)
+    GET  /health                    queue depth, workers and job counts
+
+Jobs wait in a bounded queue and are researched by a pool of worker
+threads sharing the system's LLM client, HTTP session, caches and fetch
+pool, exactly as in batch mode. Finished jobs are kept in memory (the
+newest --keep-jobs of them); their reports stay on disk.
+"""
+
+import argparse
+import json
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+from main import ResearchSystem
+from agents.report_generator import get_report_styles, parse_formats
+
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "md": "text/markdown; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+    "json": "application/json",
+    "txt": "text/plain; charset=utf-8",
+}
+
+
+class QueueFull(Exception):
+    """
+    The job queue is at capacity; retry after `retry_after` seconds
+    """
+    def __init__(self, retry_after: int):
+        super().__init__(f"job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, query: str, formats: Optional[List[str]] = None):
+        self.job_id = secrets.token_hex(6)
+        self.query = query
+        self.formats = formats
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.reports: Dict[str, str] = {}
+        self.error = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict:
+        def timestamp(value):
+            return datetime.fromtimestamp(value).isoformat(timespec='seconds') if value else None
+
+        result = {
+            'id': self.job_id,
+            'query': self.query,
+            'status': self.status,
+            'submitted_at': timestamp(self.submitted_at),
+            'started_at': timestamp(self.started_at),
+            'finished_at': timestamp(self.finished_at),
+            'formats': list(self.reports) or self.formats,
+        }
+        if self.started_at:
+            result['wait_s'] = round(self.started_at - self.submitted_at, 3)
+        if self.finished_at and self.started_at:
+            result['duration_s'] = round(self.finished_at - self.started_at, 3)
+        if self.reports:
+            result['reports'] = self.reports
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+class ResearchService:
+    """
+    Bounded job queue in front of a pool of worker threads that share one
+    ResearchSystem. `submit` never blocks: a full queue raises QueueFull,
+    which the HTTP layer turns into 503 + Retry-After (backpressure).
+    """
+    def __init__(self, system: ResearchSystem, workers: int = 4, max_queue: int = 32, keep_jobs: int = 1000):
+        self.system = system
+        self.workers = workers
+        self.keep_jobs = keep_jobs
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+        self._durations: List[float] = []
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._accepting = True
+        self._threads = [threading.Thread(target=self._work, name=f"research-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def warm_up(self):
+        """
+        Build the lazily created parts of the system now, so the first job
+        does not pay for them
+        """
+        self.system.data_collector
+        self.system.query_cache
+        try:
+            self.system.llm_client.backend
+        except Exception as e:
+            print(f"Warning: could not create the LLM client: {e}")
+        if "pdf" in self.system.report_generator.formats:
+            get_report_styles()
+
+    def submit(self, query: str, formats: Optional[Sequence[str]] = None) -> Job:
+        job = Job(query, list(formats) if formats else None)
+        with self._lock:
+            if not self._accepting:
+                raise QueueFull(self._retry_after())
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(self._retry_after())
+            self.jobs[job.job_id] = job
+            self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def recent(self, limit: int = 50) -> List[Job]:
+        with self._lock:
+            return list(reversed(self.jobs.values()))[:limit]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queued': self._queue.qsize(),
+                'max_queue': self._queue.maxsize,
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'accepting': self._accepting,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop accepting jobs, cancel the queued ones and let running jobs finish
+        """
+        with self._lock:
+            self._accepting = False
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._finish(job, "cancelled", error="service shut down before the job started")
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self.running += 1
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                reports = self.system.research(job.query, job.formats)
+                job.reports = reports
+                self._finish(job, "done" if reports else "failed", error=None if reports else "no report was written")
+            except Exception as e:
+                print(f"Error researching '{job.query}': {e}")
+                self._finish(job, "failed", error=f"{type(e).__name__}: {e}")
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        with self._lock:
+            if status == "done":
+                self.completed += 1
+                if job.started_at:
+                    self._durations = (self._durations + [job.finished_at - job.started_at])[-50:]
+            else:
+                self.failed += 1
+        job.done.set()
+
+    def _retry_after(self) -> int:
+        """
+        Rough seconds until a queue slot frees up (caller holds the lock)
+        """
+        average = sum(self._durations) / len(self._durations) if self._durations else 10.0
+        return max(1, int(round(average * max(self._queue.qsize(), 1) / max(self.workers, 1))))
+
+    def _evict(self):
+        # Forget the oldest finished jobs beyond keep_jobs (caller holds the lock)
+        excess = len(self.jobs) - self.keep_jobs
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done.is_set()][:max(excess, 0)]:
+            del self.jobs[job_id]
+
+
+def make_handler(service: ResearchService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            parts = [part for part in parsed.path.split("/") if part]
+            if parts == ["health"]:
+                return self._send_json(200, service.stats())
+            if parts == ["jobs"]:
+                return self._send_json(200, {'jobs': [job.to_dict() for job in service.recent()]})
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job = service.get(parts[1])
+                if job is None:
+                    return self._send_json(404, {'error': f"unknown job '{parts[1]}'"})
+                if len(parts) == 2:
+                    return self._send_json(200, job.to_dict())
+                if parts[2] == "report":
+                    return self._send_report(job, parse_qs(parsed.query).get("format", [None])[0])
+            self._send_json(404, {'error': f"no such endpoint: {parsed.path}"})
+
+        def do_POST(self):
+            if urlparse(self.path).path.rstrip("/") != "/jobs":
+                return self._send_json(404, {'error': f"no such endpoint: {self.path}"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                query = " ".join(str(body.get("query") or "").split())
+                formats = body.get("formats")
+                if isinstance(formats, list):
+                    formats = ",".join(formats)
+                formats = parse_formats(formats) if formats else None
+            except (ValueError, AttributeError) as e:
+                return self._send_json(400, {'error': f"invalid request: {e}"})
+            if not query:
+                return self._send_json(400, {'error': "a non-empty 'query' is required"})
+            try:
+                job = service.submit(query, formats)
+            except QueueFull as e:
+                return self._send_json(503, {'error': str(e)}, {'Retry-After': str(e.retry_after)})
+            print(f"Queued job {job.job_id}: {query}")
+            self._send_json(202, job.to_dict(), {'Location': f"/jobs/{job.job_id}"})
+
+        def _send_report(self, job: Job, report_format: Optional[str]):
+            if job.status != "done":
+                return self._send_json(409, {'error': f"job is {job.status}", 'job': job.to_dict()})
+            report_format = report_format or next(iter(job.reports))
+            path = job.reports.get(report_format)
+            if not path or not os.path.exists(path):
+                return self._send_json(404, {'error': f"no {report_format} report for this job"})
+            with open(path, "rb") as f:
+                data = f.read()
+            extension = os.path.splitext(path)[1].lstrip(".")
+            self._send(200, data, CONTENT_TYPES.get(extension, "application/octet-stream"),
+                       {'Content-Disposition': f'inline; filename="{os.path.basename(path)}"'})
+
+        def _send_json(self, status: int, obj, headers: Optional[Dict] = None):
+            self._send(status, json.dumps(obj, indent=2).encode("utf-8"), "application/json", headers)
+
+        def _send(self, status: int, data: bytes, content_type: str, headers: Optional[Dict] = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def address_string(self):
+            # Unix socket peers have no address
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: ResearchService, host: str = "127.0.0.1", port: int = 8765,
+                unix_socket: Optional[str] = None):
+    """
+    Threaded HTTP server for `service` on a TCP port or, with `unix_socket`, a Unix domain socket
+    """
+    handler = make_handler(service)
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            # A stale socket from an earlier process would make bind fail
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(unix_socket)
+                raise OSError(f"{unix_socket} is in use by a running service")
+            except ConnectionRefusedError:
+                os.remove(unix_socket)
+            finally:
+                probe.close()
+        return UnixHTTPServer(unix_socket, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port (default: 8765)")
+    parser.add_argument("--unix-socket", metavar="PATH", help="listen on a Unix domain socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=4, help="jobs researched at the same time")
+    parser.add_argument("--max-queue", type=int, default=32,
+                        help="jobs waiting for a worker before new ones are refused with 503")
+    parser.add_argument("--keep-jobs", type=int, default=1000, help="finished jobs remembered for status queries")
+    parser.add_argument("--render-processes", type=int, default=0,
+                        help="worker processes for PDF rendering (0 = render in the calling thread)")
+    parser.add_argument("--format", type=parse_formats, default=["pdf"], metavar="FORMATS",
+                        help="default report formats for jobs that do not name any (default: pdf)")
+    parser.add_argument("--no-query-cache", action="store_true",
+                        help="research every query from scratch even if a similar one was answered recently")
+    args = parser.parse_args()
+
+    system = ResearchSystem(render_processes=args.render_processes, report_formats=args.format,
+                            query_cache=not args.no_query_cache)
+    service = ResearchService(system, workers=args.workers, max_queue=args.max_queue, keep_jobs=args.keep_jobs)
+    service.warm_up()
+    server = make_server(service, args.host, args.port, args.unix_socket)
+    where = args.unix_socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Research service listening on {where} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down: finishing running jobs")
+    finally:
+        server.server_close()
+        service.shutdown()
+        system.report_generator.close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
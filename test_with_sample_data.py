@@ -1,9 +1,9 @@
-import os
-import json
 from agents.query_processor import QueryProcessor
 from agents.data_collector import DataCollector
 from agents.content_analyzer import ContentAnalyzer
 from agents.report_generator import ReportGenerator
+from agents.llm_cache import CompletionCache
+from agents.artifacts import ArtifactStore
 
 def test_with_sample_data():
     """
@@ -11,10 +11,12 @@ def test_with_sample_data():
     """
     print("Testing Multi-Agent Research System with sample data...")
     
-    # Initialize agents
-    query_processor = QueryProcessor()
-    content_analyzer = ContentAnalyzer()
+    # Initialize agents; reruns with the same fixtures are served from the cache
+    llm_cache = CompletionCache()
+    query_processor = QueryProcessor(llm_cache=llm_cache)
+    content_analyzer = ContentAnalyzer(llm_cache=llm_cache)
     report_generator = ReportGenerator()
+    artifacts = ArtifactStore()
     
     # Sample data
     original_query = "Impact of AI in healthcare"
@@ -44,6 +46,9 @@ def test_with_sample_data():
     
     print(f"Original query: {original_query}")
     print(f"Sub-queries: {sub_queries}")
+    run = artifacts.create_run(original_query, config={'sample_data': True})
+    run.put_json("sub_queries", sub_queries, stage="decompose")
+    run.put_documents("sources", sample_data, stage="clean")
     
     # Analyze content with sample data
     print("Analyzing content...")
@@ -51,11 +56,10 @@ def test_with_sample_data():
         original_query, sub_queries, sample_data
     )
     
-    # Save synthesized content
-    with open("sample_synthesized_content.json", "w") as f:
-        json.dump(synthesized_content, f, indent=2)
+    # Save synthesized content in this run's artifacts
+    run.put_json("synthesis", synthesized_content, stage="synthesize")
     
-    print("Generated sample synthesized content")
+    print(f"Generated sample synthesized content (run {run.run_id})")
     
     # Generate report
     print("Generating PDF report...")
@@ -63,6 +67,9 @@ def test_with_sample_data():
         original_query, synthesized_content
     )
     
+    run.put_json("reports", {"pdf": report_path}, stage="render")
+    run.set_status("complete" if report_path else "failed")
+    
     print(f"Sample test complete! Report saved to: {report_path}")
 
 if __name__ == "__main__":